@@ -3,10 +3,24 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import functools
+import io
+import json
+import os
+import random
+import tempfile
 import unittest
 
 import isolation
+import benchmark
+import competition_agent
+import gamelog
 import game_agent
+import opening_book
+import sample_players
+import tablebase
+import tournament
+import tune
 
 from importlib import reload
 
@@ -21,5 +35,770 @@ class IsolationTest(unittest.TestCase):
         self.game = isolation.Board(self.player1, self.player2)
 
 
+class BitBoardTest(unittest.TestCase):
+    """Check that isolation.BitBoard follows the rules of isolation.Board"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def test_random_games_match_board(self):
+        rng = random.Random(0)
+        for width, height in [(7, 7), (5, 8), (9, 9), (11, 11), (11, 9)]:
+            game = isolation.Board(self.player1, self.player2, width, height)
+            bit_game = isolation.BitBoard(self.player1, self.player2, width, height)
+            while True:
+                moves = game.get_legal_moves()
+                self.assertEqual(sorted(moves), sorted(bit_game.get_legal_moves()))
+                self.assertEqual(sorted(game.get_legal_moves(game.inactive_player)),
+                                 sorted(bit_game.get_legal_moves(bit_game.inactive_player)))
+                self.assertEqual(game.to_string(), bit_game.to_string())
+                for player in (self.player1, self.player2):
+                    self.assertEqual(game.utility(player), bit_game.utility(player))
+                    self.assertEqual(game.get_player_location(player),
+                                     bit_game.get_player_location(player))
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                game.apply_move(move)
+                bit_game = bit_game.forecast_move(move)
+
+    def test_from_board(self):
+        game = isolation.Board(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        game.apply_move((3, 5))
+        bit_game = isolation.BitBoard.from_board(game)
+        self.assertEqual(game.to_string(), bit_game.to_string())
+        self.assertEqual(sorted(game.get_legal_moves()), sorted(bit_game.get_legal_moves()))
+        self.assertEqual(bit_game.active_player, self.player2)
+
+
+class PushPopTest(unittest.TestCase):
+    """Check the make/unmake move API and the in-place alpha-beta search"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer(search_depth=3, inplace=True)
+        self.player2 = game_agent.AlphaBetaPlayer(search_depth=3)
+
+    def test_pop_restores_state(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2)
+            rng = random.Random(1)
+            snapshots = []
+            while game.get_legal_moves():
+                snapshots.append((game.to_string(), game.move_count, game.active_player))
+                game.push_move(rng.choice(game.get_legal_moves()))
+            while snapshots:
+                game.pop_move()
+                self.assertEqual((game.to_string(), game.move_count, game.active_player),
+                                 snapshots.pop())
+
+    def test_inplace_search_matches_copy_search(self):
+        game = isolation.BitBoard(self.player1, self.player2)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        self.player1.time_left = self.player2.time_left = lambda: 1000.
+        before = game.to_string()
+        best = self.player1.alphabeta(game, 4)
+        self.assertEqual(game.to_string(), before)
+        self.player1.inplace = False
+        self.assertEqual(best, self.player1.alphabeta(game, 4))
+
+
+class TranspositionTableTest(unittest.TestCase):
+    """Check Zobrist hashing and the alpha-beta transposition table"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer(tt_size=1 << 12)
+        self.player2 = game_agent.AlphaBetaPlayer()
+
+    def test_hash_is_incremental(self):
+        rng = random.Random(2)
+        game = isolation.Board(self.player1, self.player2)
+        bit_game = isolation.BitBoard(self.player1, self.player2)
+        seen = {}
+        while game.get_legal_moves():
+            self.assertEqual(game.hash(), bit_game.hash())
+            seen.setdefault(game.hash(), str(game._board_state))
+            self.assertEqual(seen[game.hash()], str(game._board_state))
+            move = rng.choice(game.get_legal_moves())
+            game = game.forecast_move(move)
+            bit_game.push_move(move)
+        bit_game.pop_move()
+        bit_game.push_move(move)
+        self.assertEqual(game.hash(), bit_game.hash())
+
+    def test_hash_of_assigned_state(self):
+        game = isolation.Board(self.player1, self.player2)
+        for move in [(3, 3), (2, 4), (5, 4)]:
+            game.apply_move(move)
+        # a state assigned directly, as in test_cases.py, gets its own key
+        assigned = isolation.Board(self.player1, self.player2)
+        assigned._board_state = list(game._board_state)
+        self.assertNotEqual(assigned.hash(), 0)
+        self.assertEqual(assigned.hash(), game.hash())
+        self.assertEqual(assigned.copy().hash(), game.hash())
+        assigned._active_player, assigned._inactive_player = self.player2, self.player1
+        game.apply_move((4, 2))
+        assigned._board_state = list(assigned._board_state)
+        assigned.apply_move((4, 2))
+        self.assertEqual(assigned.hash(), game.hash())
+
+    def test_search_value_unchanged(self):
+        game = isolation.BitBoard(self.player1, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        self.player1.time_left = lambda: 1000.
+        value, _ = self.player1.maxval(game, 5, float("-inf"), float("inf"))
+        # a repeated search is answered by the root entry
+        self.assertEqual(value, self.player1.maxval(game, 5, float("-inf"), float("inf"))[0])
+        self.assertEqual(self.player1.tt.cutoffs, 1)
+        self.player1.tt = None
+        self.assertEqual(value, self.player1.maxval(game, 5, float("-inf"), float("inf"))[0])
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Check iterative deepening with PV, killer and history move ordering"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer(move_ordering=True, tt_size=1 << 12)
+        self.player2 = game_agent.AlphaBetaPlayer()
+        self.game = isolation.BitBoard(self.player1, self.player2)
+        self.game.apply_move((3, 3))
+        self.game.apply_move((2, 4))
+
+    def test_ordering_keeps_search_result(self):
+        self.player1.time_left = lambda: 1000.
+        for depth in range(1, 6):
+            self.player1.move_ordering = True
+            best = self.player1.alphabeta(self.game, depth)
+            value = self.player1.maxval(self.game, depth, float("-inf"), float("inf"))[0]
+            self.assertEqual(best, self.player1._pv[0])
+            self.player1.move_ordering = False
+            self.player1.tt = None
+            self.assertEqual(value, self.player1.maxval(self.game, depth, float("-inf"), float("inf"))[0])
+            self.player1.tt = game_agent.TranspositionTable(1 << 12)
+
+    def test_depth_report(self):
+        calls = iter(range(10 ** 6))
+        self.player1.get_move(self.game, lambda: 1000. - next(calls) * 0.1)
+        report = self.player1.depth_report
+        self.assertEqual([r["depth"] for r in report], list(range(1, len(report) + 1)))
+        self.assertTrue(all(r["nodes"] > 0 and r["nps"] > 0 for r in report))
+
+
+class SymmetricCacheTest(unittest.TestCase):
+    """Check the canonical hash of positions and the symmetric score cache"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def images(self, history, width, height):
+        """Return the boards reached by the images of a move history under
+        every symmetry of the board.
+        """
+        games = []
+        for perm in isolation.symmetries(width, height):
+            game = isolation.Board(self.player1, self.player2, width, height)
+            for r, c in history:
+                idx = perm[r + c * height]
+                game.apply_move((idx % height, idx // height))
+            games.append(game)
+        return games
+
+    def test_canonical_hash(self):
+        rng = random.Random(3)
+        for width, height in [(7, 7), (5, 8)]:
+            positions = {}
+            for _ in range(50):
+                game = isolation.Board(self.player1, self.player2, width, height)
+                history = []
+                for _ in range(rng.randrange(8)):
+                    history.append(rng.choice(game.get_legal_moves()))
+                    game.apply_move(history[-1])
+                for player in (self.player1, self.player2):
+                    keys = {isolation.canonical_hash(g, player)
+                            for g in self.images(history, width, height)}
+                    self.assertEqual(len(keys), 1)
+                # seen by player 1, positions have the same hash iff they
+                # have the same opening book key
+                book_key = opening_book.canonical_key(game)[0]
+                self.assertEqual(positions.setdefault(
+                    isolation.canonical_hash(game, self.player1), book_key), book_key)
+            self.assertEqual(len(set(positions.values())), len(positions))
+
+    def test_cached_score(self):
+        score = game_agent.symmetric_cache(maxsize=4)(game_agent.custom_score)
+        self.assertEqual(score.__name__, "custom_score")
+        history = [(1, 2), (4, 4), (3, 3)]
+        games = self.images(history, 7, 7)
+        for game in games:
+            for player in (self.player1, self.player2):
+                self.assertEqual(score(game, player), game_agent.custom_score(game, player))
+        self.assertEqual(score.cache_info(), game_agent.CacheInfo(14, 2, 4, 2))
+        for other in ([(0, 0)], [(0, 0), (6, 6)], [(2, 2)]):
+            score(self.images(other, 7, 7)[0], self.player1)
+        self.assertEqual(score.cache_info().currsize, 4)
+        score.cache_clear()
+        self.assertEqual(score.cache_info(), game_agent.CacheInfo(0, 0, 4, 0))
+
+
+class LazySMPTest(unittest.TestCase):
+    """Check the shared transposition table and the lazy SMP player"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_shared_table_is_shared_with_children(self):
+        table = game_agent.SharedTranspositionTable(1 << 10)
+        table.store(0, 3, float("-inf"), table.LOWER, (-1, -1))
+        self.assertEqual(table.lookup(0), (0, 3, float("-inf"), table.LOWER, (-1, -1)))
+        self.assertIsNone(table.lookup(1 << 10))
+        pid = os.fork()
+        if pid == 0:
+            table.store(12345, 7, 2.5, table.EXACT, (6, 10))
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(table.lookup(12345), (12345, 7, 2.5, table.EXACT, (6, 10)))
+        table.clear()
+        self.assertIsNone(table.lookup(12345))
+
+    def test_search_value_unchanged(self):
+        player1 = game_agent.AlphaBetaPlayer(tt_size=1 << 12)
+        game = isolation.BitBoard(player1, game_agent.AlphaBetaPlayer())
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        player1.time_left = lambda: 1000.
+        player1.tt = game_agent.SharedTranspositionTable(1 << 12)
+        value = player1.maxval(game, 5, float("-inf"), float("inf"))[0]
+        player1.tt = None
+        self.assertEqual(value, player1.maxval(game, 5, float("-inf"), float("inf"))[0])
+
+    def test_helpers_are_stopped(self):
+        pids = []
+
+        class Player(game_agent.LazySMPPlayer):
+            def _stop_helpers(self):
+                pids.extend(self._helpers)
+                game_agent.LazySMPPlayer._stop_helpers(self)
+
+        player = Player(workers=3, inplace=True, move_ordering=True)
+        game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        start = isolation.wall_clock()
+        move = player.get_move(game, lambda: 100. - (isolation.wall_clock() - start))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(len(pids), 2)
+        for pid in pids:
+            self.assertRaises(ChildProcessError, os.waitpid, pid, os.WNOHANG)
+        self.assertIsNone(player._helpers)
+
+    def test_helper_move_orders_differ_on_bitboard(self):
+        player = game_agent.LazySMPPlayer(workers=4)
+        game = isolation.BitBoard(player, game_agent.AlphaBetaPlayer())
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        self.assertEqual(player._legal_moves(game, player), game.get_legal_moves(player))
+        orders = []
+        for idx in range(1, 4):
+            # what _helper_search sets up in the helper process idx
+            player._move_rng = random.Random(idx)
+            orders.append(tuple(player._legal_moves(game, player)))
+        self.assertEqual(len(set(orders)), 3)
+        self.assertEqual(sorted(orders[0]), sorted(game.get_legal_moves(player)))
+
+
+class ParallelTournamentTest(unittest.TestCase):
+    """Check that a seeded tournament round does not depend on the workers"""
+
+    def test_workers_match_serial_run(self):
+        cpu_agent = tournament.Agent(sample_players.RandomPlayer(), "Random")
+        # fixed-depth agents, so that the outcome does not depend on timing
+        test_agents = [
+            tournament.Agent(game_agent.MinimaxPlayer(search_depth=1), "MM_1"),
+            tournament.Agent(sample_players.GreedyPlayer(), "Greedy"),
+        ]
+        results = []
+        for workers in (1, 3):
+            wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+            counts = tournament.play_round(cpu_agent, test_agents, wins, 4,
+                                           isolation.Board, seed=5, workers=workers)
+            results.append(([wins[agent.player] for agent in [cpu_agent] + test_agents], counts))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(sum(results[0][0]), 2 * 4 * len(test_agents))
+
+    def test_node_budget_clock_is_reproducible(self):
+        cpu_agent = tournament.Agent(game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score),
+                                     "AB_Improved")
+        test_agents = [tournament.Agent(game_agent.AlphaBetaPlayer(move_ordering=True), "AB_Custom")]
+        results = []
+        for workers in (1, 2):
+            wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+            tournament.play_round(cpu_agent, test_agents, wins, 2, isolation.BitBoard, seed=3,
+                                  workers=workers, clock=isolation.NodeBudgetClock(0.5))
+            results.append([wins[agent.player] for agent in [cpu_agent] + test_agents])
+        self.assertEqual(results[0], results[1])
+
+
+class BoardSizeTest(unittest.TestCase):
+    """Check that the agents and the tournament run on boards larger than 7x7"""
+
+    def test_larger_boards(self):
+        cpu_agent = tournament.Agent(game_agent.AlphaBetaPlayer(search_depth=2), "AB_2")
+        test_agents = [tournament.Agent(game_agent.MinimaxPlayer(search_depth=1), "MM_1")]
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for width, height in [(9, 9), (11, 11), (11, 9)]:
+                sized = functools.partial(board_cls, width=width, height=height)
+                wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+                stats_file = io.StringIO()
+                tournament.play_round(cpu_agent, test_agents, wins, 1, sized, seed=1,
+                                      stats_file=stats_file)
+                self.assertEqual(sum(wins.values()), 2)
+                for line in stats_file.getvalue().splitlines():
+                    game = sized(1, 2)
+                    for move in json.loads(line)["history"]:
+                        self.assertIn(tuple(move), game.get_legal_moves())
+                        game.apply_move(tuple(move))
+
+    def test_is_wall(self):
+        game = isolation.Board("Player1", "Player2", 11, 5)
+        self.assertEqual(game_agent.is_wall(game, (4, 5)), 1.)
+        self.assertEqual(game_agent.is_wall(game, (2, 10)), 1.)
+        self.assertEqual(game_agent.is_wall(game, (2, 5)), 0.)
+
+
+class BatchScoreTest(unittest.TestCase):
+    """Check the vectorized leaf evaluation against the scalar heuristics"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer()
+        self.player2 = game_agent.AlphaBetaPlayer()
+        self.pairs = [
+            (game_agent.custom_score, game_agent.batch_custom_score),
+            (game_agent.custom_score_2, game_agent.batch_custom_score_2),
+            (game_agent.custom_score_3, game_agent.batch_custom_score_3),
+            (lambda g, p: game_agent.custom_score_comb(g, p, 0.5),
+             lambda g, p, m: game_agent.batch_custom_score_comb(g, p, m, 0.5)),
+            (lambda g, p: game_agent.custom_score_adaptive(g, p, True),
+             lambda g, p, m: game_agent.batch_custom_score_adaptive(g, p, m, True)),
+            (sample_players.improved_score,
+             lambda g, p, m: game_agent.batch_weighted_score(g, p, m, 1.0)),
+        ]
+
+    def test_batch_matches_scalar(self):
+        rng = random.Random(4)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2)
+            game.apply_move((3, 3))
+            while game.get_legal_moves():
+                moves = game.get_legal_moves()
+                for player in (self.player1, self.player2):
+                    for score_fn, batch_fn in self.pairs:
+                        expected = [score_fn(game.forecast_move(m), player) for m in moves]
+                        self.assertEqual(expected, list(batch_fn(game, player, moves)))
+                game.apply_move(rng.choice(moves))
+
+    def test_batch_search_value_unchanged(self):
+        game = isolation.BitBoard(self.player1, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        self.player1.time_left = lambda: 1000.
+        for depth in range(1, 5):
+            self.player1.batch_score = None
+            value = self.player1.maxval(game, depth, float("-inf"), float("inf"))[0]
+            self.player1.batch_score = game_agent.batch_custom_score
+            self.assertEqual(value, self.player1.maxval(game, depth, float("-inf"), float("inf"))[0])
+
+
+class EndgameTest(unittest.TestCase):
+    """Check the endgame solver against a brute-force longest path search"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer(endgame=True)
+        self.player2 = game_agent.AlphaBetaPlayer()
+
+    def longest_path(self, game, loc):
+        best = 0
+        for dr, dc in isolation.isolation.KNIGHT_DIRECTIONS:
+            dest = (loc[0] + dr, loc[1] + dc)
+            if game.move_is_legal(dest):
+                child = game.copy()
+                child._board_state[dest[0] + dest[1] * game.height] = 1
+                best = max(best, 1 + self.longest_path(child, dest))
+        return best
+
+    def partitioned_games(self, count):
+        solver = isolation.EndgameSolver(7, 7)
+        rng = random.Random(8)
+        games = []
+        while len(games) < count:
+            game = isolation.Board(self.player1, self.player2)
+            while game.get_legal_moves() and not solver.is_partitioned(game):
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if game.get_legal_moves() and len(game.get_blank_spaces()) < 20:
+                games.append(game)
+        return games
+
+    def test_path_lengths_are_exact(self):
+        solver = isolation.EndgameSolver(7, 7)
+        for game in self.partitioned_games(5):
+            expected = tuple(self.longest_path(game, game.get_player_location(p))
+                             for p in (game.active_player, game.inactive_player))
+            self.assertEqual(expected, solver.path_lengths(game))
+            solver.clear()
+            move, length = solver.best_move(game)
+            # a winning path need not be the longest one
+            self.assertEqual(expected[0] > expected[1], length > expected[1])
+            self.assertLessEqual(length - 1, self.longest_path(game.forecast_move(move), move))
+
+    def test_player_switches_to_solver(self):
+        solver = isolation.EndgameSolver(7, 7)
+        for game in self.partitioned_games(5):
+            if game.active_player is not self.player1:
+                continue
+            move = self.player1.get_move(game, lambda: 1000.)
+            self.assertEqual([], self.player1.depth_report)
+            self.assertLessEqual(solver.best_move(game)[1],
+                                 1 + self.longest_path(game.forecast_move(move), move))
+
+
+class TablebaseTest(unittest.TestCase):
+    """Check the retrograde tablebase against an exhaustive search"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "tb.bin")
+        tablebase.save_tablebase(tablebase.build_tablebase(5, 4, 7), cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def solve(self, game):
+        """Return (win, distance) of the player to move by exhaustive search."""
+        results = [self.solve(game.forecast_move(m)) for m in game.get_legal_moves()]
+        if not results:
+            return False, 0
+        wins = [dist for win, dist in results if not win]
+        if wins:
+            return True, 1 + min(wins)
+        return False, 1 + max(dist for _, dist in results)
+
+    def positions(self, count, player_1="Player1", player_2="Player2"):
+        rng = random.Random(7)
+        games = []
+        while len(games) < count:
+            game = isolation.Board(player_1, player_2, 5, 4)
+            while game.get_legal_moves() and 20 - game.move_count > 7 - rng.randrange(4):
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if game.get_legal_moves():
+                games.append(game)
+        return games
+
+    def test_probe_matches_search(self):
+        table = tablebase.Tablebase(self.path)
+        self.assertEqual((table.width, table.height, table.max_empty), (5, 4, 7))
+        self.assertIsNone(table.probe(isolation.Board("Player1", "Player2", 5, 4)))
+        for game in self.positions(100):
+            win, dist = table.probe(game)
+            self.assertEqual((win, dist), self.solve(game))
+            move, _ = table.best_move(game)
+            child = table.probe(game.forecast_move(move))
+            self.assertEqual(child, (False, dist - 1) if win else (True, dist - 1))
+
+    def test_player_uses_tablebase(self):
+        table = tablebase.Tablebase(self.path)
+        players = [game_agent.AlphaBetaPlayer(tablebase=table) for _ in range(2)]
+        for game in self.positions(20, *players):
+            player = game.active_player
+            win, _ = table.probe(game)
+            move = player.get_move(game, lambda: 1000.)
+            self.assertEqual(table.probe(game.forecast_move(move))[0], not win)
+            # the search stops at the positions of the table
+            player.time_left = lambda: 1000.
+            nodes = player.nodes
+            player.alphabeta(game, 3)
+            self.assertLessEqual(player.nodes - nodes, 1 + len(game.get_legal_moves()))
+            self.assertEqual(player.stats.heuristic_calls, 0)
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Check that book moves are found in every symmetric position"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer()
+        self.player2 = game_agent.AlphaBetaPlayer()
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        opening_book.save_book(opening_book.build_book(plies=2, time_limit=20, verbose=False),
+                               self.path)
+
+    def test_symmetric_lookup(self):
+        book = opening_book.OpeningBook(self.path)
+        self.assertEqual(11, len(book))
+        for first in [(0, 0), (1, 2), (3, 3)]:
+            moves = []
+            for perm in opening_book.symmetries(7, 7):
+                game = isolation.Board(self.player1, self.player2)
+                idx = perm[first[0] + first[1] * 7]
+                game.apply_move((idx % 7, idx // 7))
+                move = book.lookup(game)
+                self.assertTrue(game.move_is_legal(move))
+                moves.append(perm.index(move[0] + move[1] * 7))
+            # the same move up to symmetry in all frames
+            game = isolation.Board(self.player1, self.player2)
+            game.apply_move(first)
+            self.assertEqual(1, len({opening_book.canonical_key(game.forecast_move(
+                (m % 7, m // 7)))[0] for m in moves}))
+
+    def test_player_uses_book(self):
+        book = opening_book.OpeningBook(self.path)
+        player = game_agent.AlphaBetaPlayer(opening_book=book)
+        game = isolation.Board(player, self.player2)
+        self.assertEqual(book.lookup(game), player.get_move(game, lambda: 1000.))
+        self.assertEqual([], player.depth_report)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        self.assertIsNone(book.lookup(game))
+
+    def test_check_time_drops_unstable_positions(self):
+        search = opening_book.search_position
+
+        def fake_search(job):
+            key, history = job[0], job[1]
+            cell = 24 if history else job[4]
+            return key, cell, 0
+
+        opening_book.search_position = fake_search
+        self.addCleanup(setattr, opening_book, "search_position", search)
+        book = opening_book.build_book(plies=2, time_limit=20, verbose=False, check_time=10)
+        self.assertEqual(10, len(book["moves"]))
+        self.assertNotIn("0.-1.-1", book["moves"])
+
+
+class MCTSTest(unittest.TestCase):
+    """Check the playout board and the Monte Carlo tree search player"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer()
+        self.player2 = game_agent.AlphaBetaPlayer()
+
+    def test_playout_board(self):
+        rng = random.Random(10)
+        game = isolation.Board(self.player1, self.player2)
+        while game.get_legal_moves():
+            board = isolation.PlayoutBoard.from_board(game)
+            self.assertEqual(sorted(game.get_legal_moves()),
+                             sorted(board.to_move(idx) for idx in board.legal_moves()))
+            start_count = isolation.popcount(board.occupied)
+            won = board.playout(rng)
+            self.assertEqual([], board.legal_moves())
+            # the first player to move wins iff it made the last move
+            self.assertEqual(won, (isolation.popcount(board.occupied) - start_count) % 2 == 1)
+            game.apply_move(rng.choice(game.get_legal_moves()))
+
+    def test_finds_immediate_win(self):
+        random.seed(11)
+        rng = random.Random(11)
+        player = competition_agent.MCTSPlayer()
+        found = 0
+        while found < 5:
+            game = isolation.Board(player, self.player2)
+            while game.get_legal_moves():
+                moves = game.get_legal_moves()
+                winning = [m for m in moves if not game.forecast_move(m).get_legal_moves()]
+                if game.active_player is player and winning and len(winning) < len(moves):
+                    calls = [0]
+
+                    def time_left():
+                        calls[0] += 1
+                        return 1000. if calls[0] < 2000 else 0.
+
+                    self.assertIn(player.get_move(game, time_left), winning)
+                    self.assertGreater(player.playouts, 0)
+                    found += 1
+                game.apply_move(rng.choice(moves))
+
+
+class SearchStatsTest(unittest.TestCase):
+    """Check the search statistics of the players and their json output"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = game_agent.AlphaBetaPlayer(move_ordering=True)
+        self.player2 = game_agent.MinimaxPlayer(search_depth=1)
+        self.game = isolation.Board(self.player1, self.player2)
+        self.game.apply_move((3, 3))
+        self.game.apply_move((2, 4))
+
+    def test_minimax_counts(self):
+        game = self.game.forecast_move((1, 1))
+        self.player2.get_move(game, lambda: 1000.)
+        stats = self.player2.stats
+        num_moves = len(game.get_legal_moves())
+        self.assertEqual((1, 1 + num_moves, num_moves, 0, [1]),
+                         (stats.moves, stats.nodes, stats.heuristic_calls, stats.timeouts,
+                          stats.depths))
+
+    def test_alphabeta_counts(self):
+        calls = [0]
+
+        def time_left():
+            calls[0] += 1
+            return 1000. if calls[0] < 5000 else 0.
+
+        self.player1.get_move(self.game, time_left)
+        stats = self.player1.stats
+        self.assertEqual((1, 1, self.player1.nodes), (stats.moves, stats.timeouts, stats.nodes))
+        self.assertEqual([len(self.player1.depth_report)], stats.depths)
+        self.assertEqual(stats.depths[0], len(stats.iteration_ms[0]))
+        self.assertGreater(stats.heuristic_calls, 0)
+        self.assertGreater(sum(stats.cutoffs.values()), 0)
+        # the aborted iteration may have reached one more ply
+        self.assertLessEqual(max(stats.cutoffs), stats.depths[0])
+
+    def test_tournament_writes_json(self):
+        cpu_agent = tournament.Agent(sample_players.RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(game_agent.MinimaxPlayer(search_depth=1), "MM_1")]
+        wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+        out = io.StringIO()
+        tournament.play_round(cpu_agent, test_agents, wins, 2, seed=1, stats_file=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(4, len(records))
+        for record in records:
+            self.assertIsNone(record["cpu_stats"])
+            self.assertEqual("MM_1", record["test_agent"])
+            stats = record["test_stats"]
+            self.assertGreater(stats["nodes"], 0)
+            # the loser is also asked for a move when it has none left
+            self.assertIn(stats["moves"], range(record["moves"] // 2, record["moves"] // 2 + 2))
+
+
+class PollingTest(unittest.TestCase):
+    """Check that amortized clock polling still stops at the threshold"""
+
+    def test_auto_poll_interval(self):
+        reload(game_agent)
+        for poll_interval in (1, "auto"):
+            player = game_agent.AlphaBetaPlayer(move_ordering=True, poll_interval=poll_interval)
+            game = isolation.BitBoard(player, game_agent.AlphaBetaPlayer())
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            # the clock advances by 0.01 ms per node
+            time_left = lambda: 150. - 0.01 * player.nodes
+            player.get_move(game, time_left)
+            self.assertLess(time_left(), player.TIMER_THRESHOLD + 0.01)
+            self.assertGreaterEqual(time_left(), player.TIMER_THRESHOLD - 0.01)
+            if poll_interval == 1:
+                # the last read aborts the search before counting its node
+                self.assertEqual(player.nodes + 1, player.clock_reads)
+            else:
+                self.assertLess(player.clock_reads, 50)
+
+
+class GameLogTest(unittest.TestCase):
+    """Check that tournament games are logged and replayed faithfully"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def test_tournament_log_replay(self):
+        cpu_agent = tournament.Agent(sample_players.RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(game_agent.MinimaxPlayer(search_depth=1), "MM_1")]
+        wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+        for _ in range(2):
+            # the second round reopens the log and reuses its agent ids
+            tournament.play_round(cpu_agent, test_agents, wins, 2, seed=1,
+                                  game_log=gamelog.GameLog(self.path))
+        records = list(gamelog.read_games(self.path))
+        self.assertEqual(8, len(records))
+        self.assertEqual({"Random": 0, "MM_1": 1}, gamelog.GameLog(self.path).agents)
+
+        for record in records:
+            self.assertEqual(2, record.opening)
+            self.assertEqual(len(record.moves) - record.opening + 1, len(record.move_times))
+            board = None
+            for board, move in gamelog.replay(record):
+                self.assertTrue(board.move_is_legal(move))
+            board.apply_move(move)
+            if record.termination == "illegal move":
+                # the loser is the player to move, and has no legal moves
+                self.assertEqual([], board.get_legal_moves())
+                self.assertEqual(record.players[record.winner], board.inactive_player)
+
+        summary = gamelog.summarize(records)
+        self.assertEqual(wins[test_agents[0].player], summary["MM_1"]["wins"])
+        self.assertEqual((8, 8), (summary["Random"]["games"], summary["MM_1"]["games"]))
+        self.assertLess(os.path.getsize(self.path), 8 * 100)
+
+
+class BenchmarkTest(unittest.TestCase):
+    """Check that the benchmark corpus gives reproducible node counts"""
+
+    def test_nodes_to_depth_is_reproducible(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            games = benchmark.load_positions(board_cls=board_cls)[:10]
+            self.assertTrue(all(game.get_legal_moves() for game in games))
+            nodes = [benchmark.nodes_to_depth(sample_players.improved_score, games, 3)[0]
+                     for _ in range(2)]
+            self.assertEqual(nodes[0], nodes[1])
+            self.assertGreater(benchmark.evals_per_second(sample_players.improved_score,
+                                                          games, repeat=1), 0)
+
+    def test_previous_run(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        runs = [{"board": "Board", "depth": 4, "date": "a"},
+                {"board": "BitBoard", "depth": 4, "date": "b"},
+                {"board": "Board", "depth": 4, "date": "c"}]
+        with open(path, "w") as f:
+            for run in runs:
+                f.write(json.dumps(run) + "\n")
+        self.assertEqual("c", benchmark.previous_run({"board": "Board", "depth": 4}, path)["date"])
+        self.assertIsNone(benchmark.previous_run({"board": "Board", "depth": 5}, path))
+
+
+class TuneTest(unittest.TestCase):
+    """Check the SPSA weight tuner and the resumption of its checkpoints"""
+
+    def test_resumed_run_matches_uninterrupted_run(self):
+        state = tune.new_state("aggressive", seed=4, pairs=1, nodes=100)
+        tune.tune(state, 2, verbose=False)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tune.json")
+            resumed = tune.new_state("aggressive", seed=4, pairs=1, nodes=100)
+            tune.tune(resumed, 1, checkpoint=path, verbose=False)
+            resumed = tune.tune(tune.load_checkpoint(path), 2, workers=2, checkpoint=path,
+                                verbose=False)
+            self.assertEqual(tune.load_checkpoint(path), resumed)
+        self.assertEqual(state, resumed)
+        self.assertEqual([h["iteration"] for h in state["history"]], [0, 1])
+
+    def test_weights_stay_in_bounds(self):
+        state = tune.new_state("combined", pairs=1, nodes=50, a=100.)
+        tune.tune(state, 3, verbose=False)
+        low, high = tune.FAMILIES["combined"].bounds[0]
+        for theta in [h["theta"] for h in state["history"]] + [state["theta"]]:
+            self.assertTrue(low <= theta[0] <= high)
+
+
 if __name__ == '__main__':
     unittest.main()
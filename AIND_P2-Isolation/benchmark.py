@@ -0,0 +1,322 @@
+"""Microbenchmarks of the isolation score functions and of alpha-beta search.
+
+The benchmarks run over a fixed corpus of mid-game positions recorded from
+seeded games between fixed-depth minimax agents (`benchmark_positions.json`)
+and measure, for every heuristic:
+
+- the number of score function evaluations per second, and
+- the number of nodes `AlphaBetaPlayer` expands to search every position to
+  a fixed depth, and the time it takes.
+
+Each run is appended as one json object to `benchmark_results.jsonl`, with
+the date, the git commit and the platform, and the table printed at the end
+compares the run to the previous one stored in the file.
+
+`--smp` instead measures the time `LazySMPPlayer` takes to complete the
+iterative deepening iteration of `--depth` with each number of processes,
+and `--sizes` measures how move generation, evaluation and search scale
+with the size of the board, on positions recorded on the fly for every size.
+
+    python benchmark.py                    # run and store the benchmarks
+    python benchmark.py --depth 5 --bitboard
+    python benchmark.py --record 20        # re-record the position corpus
+    python benchmark.py --sizes 7,9,11     # throughput vs. board size
+    python benchmark.py --smp 1,2,4        # lazy SMP time to depth
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import timeit
+
+from isolation import Board, BitBoard
+from sample_players import improved_score, center_score
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, LazySMPPlayer, custom_score, custom_score_2,
+                        custom_score_3, custom_score_adaptive)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+POSITIONS_PATH = os.path.join(_HERE, "benchmark_positions.json")
+RESULTS_PATH = os.path.join(_HERE, "benchmark_results.jsonl")
+
+HEURISTICS = [
+    ("custom_score", custom_score),
+    ("custom_score_2", custom_score_2),
+    ("custom_score_3", custom_score_3),
+    ("custom_score_adaptive", custom_score_adaptive),
+    ("improved_score", improved_score),
+    ("center_score", center_score),
+]
+
+
+def record_positions(num_games=20, plies=(8, 14, 20), seed=0, width=7, height=7):
+    """Play seeded games between depth-2 minimax agents from random openings
+    and return the move histories of the positions reached after each number
+    of `plies` in which the player to move still has legal moves.
+    """
+    random.seed(seed)
+    positions = []
+    for _ in range(num_games):
+        player_1 = MinimaxPlayer(search_depth=2, score_fn=improved_score)
+        player_2 = MinimaxPlayer(search_depth=2, score_fn=custom_score)
+        game = Board(player_1, player_2, width, height)
+        history = []
+        while game.get_legal_moves() and len(history) <= max(plies):
+            if len(history) < 2:
+                move = random.choice(game.get_legal_moves())
+            else:
+                move = game.active_player.get_move(game.copy(), lambda: 1e9)
+            game.apply_move(move)
+            history.append(list(move))
+            if len(history) in plies and game.get_legal_moves():
+                positions.append(list(history))
+    return positions
+
+
+def save_positions(positions, path=POSITIONS_PATH, width=7, height=7):
+    with open(path, "w") as f:
+        json.dump({"width": width, "height": height, "positions": positions}, f)
+
+
+def load_positions(path=POSITIONS_PATH, board_cls=Board, player_cls=AlphaBetaPlayer):
+    """Return the corpus positions as boards between two new players."""
+    with open(path) as f:
+        data = json.load(f)
+    return replay_positions(data["positions"], board_cls, data["width"], data["height"],
+                            player_cls)
+
+
+def replay_positions(positions, board_cls=Board, width=7, height=7, player_cls=AlphaBetaPlayer):
+    """Return the move histories `positions` as boards between two new players."""
+    games = []
+    for history in positions:
+        game = board_cls(player_cls(), player_cls(), width, height)
+        for move in history:
+            game.apply_move(tuple(move))
+        games.append(game)
+    return games
+
+
+def evals_per_second(score_fn, games, repeat=5):
+    """Return the best rate over `repeat` rounds at which `score_fn`
+    evaluates every game from the point of view of both players.
+    """
+    cases = [(game, player) for game in games
+             for player in (game.active_player, game.inactive_player)]
+
+    def evaluate():
+        for game, player in cases:
+            score_fn(game, player)
+
+    number = max(1, 2000 // len(cases))
+    best = min(timeit.repeat(evaluate, number=number, repeat=repeat))
+    return number * len(cases) / best
+
+
+def nodes_to_depth(score_fn, games, depth):
+    """Search every game to `depth` with the `AlphaBetaPlayer` playing the
+    active side, reset to its default options, and return the total number
+    of nodes and milliseconds.
+
+    The global random state is reseeded before every search, since
+    `Board.get_legal_moves` shuffles the moves.
+    """
+    nodes = 0
+    elapsed = 0.
+    for game in games:
+        player = game.active_player
+        AlphaBetaPlayer.__init__(player, search_depth=depth, score_fn=score_fn)
+        player.time_left = lambda: float("inf")
+        random.seed(0)
+        start = time.perf_counter()
+        player.alphabeta(game, depth)
+        elapsed += time.perf_counter() - start
+        nodes += player.nodes
+    return nodes, 1000. * elapsed
+
+
+def moves_per_second(games, repeat=5):
+    """Return the best rate over `repeat` rounds at which the legal moves of
+    both players of every game are generated.
+    """
+    cases = [(game, player) for game in games
+             for player in (game.active_player, game.inactive_player)]
+
+    def generate():
+        for game, player in cases:
+            game.get_legal_moves(player)
+
+    number = max(1, 2000 // len(cases))
+    best = min(timeit.repeat(generate, number=number, repeat=repeat))
+    return number * len(cases) / best
+
+
+def size_scaling(sizes=(7, 9, 11), depth=4, num_games=5, score_fn=improved_score):
+    """Measure the throughput of both board classes on square boards of
+    every size in `sizes`, over positions recorded from `num_games` seeded
+    games per size.
+
+    Returns
+    -------
+    list<dict>
+        One entry per size and board class with the legal move generations,
+        the `score_fn` evaluations and the alpha-beta nodes (searching to
+        `depth`) per second.
+    """
+    results = []
+    for size in sizes:
+        positions = record_positions(num_games, width=size, height=size)
+        for board_cls in (Board, BitBoard):
+            games = replay_positions(positions, board_cls, size, size)
+            nodes, elapsed = nodes_to_depth(score_fn, games, depth)
+            results.append({
+                "size": size,
+                "board": board_cls.__name__,
+                "positions": len(games),
+                "moves_per_sec": moves_per_second(games),
+                "evals_per_sec": evals_per_second(score_fn, games),
+                "nodes_per_sec": 1000. * nodes / elapsed if elapsed else 0.,
+            })
+    return results
+
+
+def report_scaling(results):
+    print("{:<8}{:<10}{:>6}{:>14}{:>14}{:>14}".format(
+        "Size", "Board", "Pos", "Moves/s", "Evals/s", "Nodes/s"))
+    for r in results:
+        print("{:<8}{:<10}{:>6}{:>14,.0f}{:>14,.0f}{:>14,.0f}".format(
+            "{0}x{0}".format(r["size"]), r["board"], r["positions"], r["moves_per_sec"],
+            r["evals_per_sec"], r["nodes_per_sec"]))
+
+
+def smp_time_to_depth(games, depth, workers=(1, 2, 4), score_fn=improved_score):
+    """Return, for every number of processes in `workers`, the total
+    milliseconds the `LazySMPPlayer` playing the active side of `games`
+    takes to complete the iterative deepening iteration of `depth` over all
+    games, and the speedup relative to the first number of processes.
+    """
+    results = []
+    for num_workers in workers:
+        elapsed = 0.
+        for game in games:
+            player = game.active_player
+            LazySMPPlayer.__init__(player, score_fn=score_fn, workers=num_workers, inplace=True,
+                                   move_ordering=True)
+            # stop the search as soon as the iteration of `depth` completes
+            time_left = lambda: -1. if len(player.depth_report) >= depth else 1e9
+            random.seed(0)
+            start = time.perf_counter()
+            player.get_move(game, time_left)
+            elapsed += time.perf_counter() - start
+        results.append({"workers": num_workers, "search_ms": 1000. * elapsed})
+    for r in results:
+        r["speedup"] = results[0]["search_ms"] / r["search_ms"]
+    return results
+
+
+def report_smp(results, depth):
+    print("Lazy SMP, time to complete depth {} on {} core(s)".format(depth, os.cpu_count()))
+    print("{:<10}{:>14}{:>10}".format("Workers", "Search ms", "Speedup"))
+    for r in results:
+        print("{:<10}{:>14,.1f}{:>10.2f}".format(r["workers"], r["search_ms"], r["speedup"]))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(depth=4, board_cls=Board, positions_path=POSITIONS_PATH):
+    """Run all benchmarks and return the results as a dictionary."""
+    games = load_positions(positions_path, board_cls)
+    results = {}
+    for name, score_fn in HEURISTICS:
+        nodes, elapsed = nodes_to_depth(score_fn, games, depth)
+        results[name] = {
+            "evals_per_sec": evals_per_second(score_fn, games),
+            "nodes": nodes,
+            "search_ms": elapsed,
+        }
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "board": board_cls.__name__,
+        "positions": len(games),
+        "depth": depth,
+        "results": results,
+    }
+
+
+def previous_run(run_result, path=RESULTS_PATH):
+    """Return the last stored run with the same board class and depth."""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            stored = json.loads(line)
+            if (stored["board"], stored["depth"]) == (run_result["board"], run_result["depth"]):
+                previous = stored
+    return previous
+
+
+def report(run_result, previous=None):
+    print("{} positions, alpha-beta to depth {} on {}".format(
+        run_result["positions"], run_result["depth"], run_result["board"]))
+    if previous is not None:
+        print("change relative to {} ({})".format(previous["date"], previous["commit"]))
+    print("{:<24}{:>14}{:>8}{:>12}{:>8}{:>12}{:>8}".format(
+        "Heuristic", "Evals/s", "", "Nodes", "", "Search ms", ""))
+    for name, result in run_result["results"].items():
+        old = previous["results"].get(name) if previous is not None else None
+        changes = []
+        for key in ("evals_per_sec", "nodes", "search_ms"):
+            if old is None or not old[key]:
+                changes.append("")
+            else:
+                changes.append("{:+.0f}%".format(100. * (result[key] / old[key] - 1)))
+        print("{:<24}{:>14,.0f}{:>8}{:>12,}{:>8}{:>12,.1f}{:>8}".format(
+            name, result["evals_per_sec"], changes[0], result["nodes"], changes[1],
+            result["search_ms"], changes[2]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the isolation heuristics.")
+    parser.add_argument('--depth', type=int, default=4,
+                        help="Depth of the alpha-beta search of every position.")
+    parser.add_argument('--bitboard', action="store_true",
+                        help="Run the benchmarks on isolation.BitBoard instead of isolation.Board.")
+    parser.add_argument('--record', type=int, default=None, metavar="GAMES",
+                        help="Re-record the position corpus from GAMES seeded games and exit.")
+    parser.add_argument('--no-store', action="store_true",
+                        help="Do not append the results to " + os.path.basename(RESULTS_PATH))
+    parser.add_argument('--sizes', default=None, metavar="N,N,...",
+                        help="Compare the throughput on square boards of the given sizes and exit.")
+    parser.add_argument('--smp', default=None, metavar="N,N,...",
+                        help="Compare the lazy SMP search with the given numbers of processes " +
+                             "and exit.")
+    args = parser.parse_args()
+
+    if args.smp is not None:
+        workers = [int(n) for n in args.smp.split(",")]
+        games = load_positions(player_cls=LazySMPPlayer)
+        report_smp(smp_time_to_depth(games, args.depth, workers), args.depth)
+    elif args.sizes is not None:
+        report_scaling(size_scaling([int(n) for n in args.sizes.split(",")], args.depth))
+    elif args.record is not None:
+        positions = record_positions(args.record)
+        save_positions(positions)
+        print("Recorded {} positions to {}".format(len(positions), POSITIONS_PATH))
+    else:
+        result = run(args.depth, BitBoard if args.bitboard else Board)
+        report(result, previous_run(result))
+        if not args.no_store:
+            with open(RESULTS_PATH, "a") as f:
+                f.write(json.dumps(result, sort_keys=True) + "\n")
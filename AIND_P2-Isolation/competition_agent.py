@@ -4,12 +4,13 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import math
 import random
 
-
-class SearchTimeout(Exception):
-    """Subclass base exception for code clarity. """
-    pass
+import game_agent
+from game_agent import AlphaBetaPlayer, SearchTimeout
+from isolation import PlayoutBoard
+from opening_book import OpeningBook
 
 
 def custom_score(game, player):
@@ -33,10 +34,111 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    return game_agent.custom_score(game, player)
+
+
+class MCTSNode:
+    """Node of the Monte Carlo search tree.
+
+    `wins` counts the playouts won by the player who made `move`, i.e. the
+    opponent of the player to move in the node. Nodes hold no reference to
+    their parent, so that a tree is freed as soon as the search returns
+    instead of waiting for the cycle collector.
+    """
+
+    __slots__ = ("move", "children", "untried", "wins", "visits")
 
+    def __init__(self, move, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.wins = 0
+        self.visits = 0
 
-class CustomPlayer:
+
+class MCTSPlayer:
+    """Game-playing agent that chooses a move with Monte Carlo tree search
+    using the UCT selection rule and uniformly random playouts on an
+    `isolation.PlayoutBoard`.
+
+    Parameters
+    ----------
+    c : float (optional)
+        Exploration constant of UCT: children are selected by maximizing
+        `wins / visits + c * sqrt(ln(parent visits) / visits)`.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+    """
+
+    def __init__(self, c=math.sqrt(2), timeout=10.):
+        self.c = c
+        self.time_left = None
+        self.TIMER_THRESHOLD = timeout
+        # number of playouts of all get_move() calls, and the rate of the
+        # last call
+        self.playouts = 0
+        self.playouts_per_second = 0.
+
+    def get_move(self, game, time_left):
+        """Run playouts from the current position until the time limit and
+        return the move of the most visited root child, or (-1, -1) if there
+        are no legal moves.
+        """
+        self.time_left = time_left
+        start = time_left()
+
+        board = PlayoutBoard.from_board(game)
+        root = MCTSNode(None, list(board.legal_moves()))
+        if len(root.untried) <= 1:
+            return board.to_move(root.untried[0]) if root.untried else (-1, -1)
+
+        playouts = 0
+        while time_left() > self.TIMER_THRESHOLD:
+            self.iterate(root, board)
+            playouts += 1
+
+        elapsed = start - time_left()
+        self.playouts += playouts
+        self.playouts_per_second = 1000. * playouts / elapsed if elapsed > 0 else float("inf")
+        if not root.children:
+            return board.to_move(root.untried[0])
+        return board.to_move(max(root.children, key=lambda n: n.visits).move)
+
+    def iterate(self, root, root_board):
+        """Run one selection, expansion, playout and backpropagation step."""
+        node, board = root, root_board.copy()
+        path = [root]
+        while not node.untried and node.children:
+            node = self.select(node)
+            board.apply(node.move)
+            path.append(node)
+
+        if node.untried:
+            idx = node.untried.pop(int(random.random() * len(node.untried)))
+            board.apply(idx)
+            node = MCTSNode(idx, list(board.legal_moves()))
+            path[-1].children.append(node)
+            path.append(node)
+
+        # the player to move in a node wins iff the player to move in its
+        # parent does not
+        to_move_wins = board.playout()
+        for node in reversed(path):
+            node.visits += 1
+            if not to_move_wins:
+                node.wins += 1
+            to_move_wins = not to_move_wins
+
+    def select(self, node):
+        """Return the child of `node` with the highest UCT value."""
+        log_visits = math.log(node.visits)
+        c = self.c
+        return max(node.children, key=lambda n: n.wins / n.visits +
+                   c * math.sqrt(log_visits / n.visits))
+
+
+class CustomPlayer(AlphaBetaPlayer):
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
@@ -52,19 +154,27 @@ class CustomPlayer:
     Parameters
     ----------
     data : string
-        The name of the search method to use in get_move().
+        The name of the search method to use in get_move(): "mcts" for Monte
+        Carlo tree search with an `MCTSPlayer`, otherwise iterative deepening
+        alpha-beta search.
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    book : `opening_book.OpeningBook` (optional)
+        The opening book consulted before searching; by default the book in
+        `data.json` next to this file, read the first time it is needed.
     """
 
-    def __init__(self, data=None, timeout=1.):
-        self.score = custom_score
-        self.time_left = None
-        self.TIMER_THRESHOLD = timeout
+    def __init__(self, data=None, timeout=1., book=None):
+        AlphaBetaPlayer.__init__(self, score_fn=custom_score, timeout=timeout,
+                                 inplace=True, tt_size=1 << 16, move_ordering=True,
+                                 endgame=True, poll_interval="auto",
+                                 opening_book=book if book is not None else OpeningBook())
+        self.mcts = MCTSPlayer(timeout=timeout) if data == "mcts" else None
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +203,10 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        if self.mcts is None:
+            return AlphaBetaPlayer.get_move(self, game, time_left)
+
+        move = self.opening_book.lookup(game)
+        if move is not None and game.move_is_legal(move):
+            return move
+        return self.mcts.get_move(game, time_left)
@@ -2,9 +2,17 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import functools
+import mmap
+import os
 import random
+import signal
+import struct
+from collections import OrderedDict, namedtuple
 import numpy as np
 
+from isolation import move_tables, popcount, EndgameSolver, canonical_hash
+
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
@@ -43,21 +51,27 @@ def weighted_score(game, player, weight):
     return float(own_moves - weight*opp_moves)
 
 def is_wall(game, move):
-    if move[0] == 0 or move[0] == game.width-1 \
-       or move[1] == 0 or move[1] == game.height -1:
+    if move[0] == 0 or move[0] == game.height - 1 \
+       or move[1] == 0 or move[1] == game.width - 1:
         return 1.
     return 0.
 
 def wall_score(game, moves):
-    return np.sum([is_wall(game, m) for m in moves])
+    return float(sum(is_wall(game, m) for m in moves))
 
 def weighted_move_score(game, moves):
-    return float(np.sum([len(game._Board__get_moves(m)) for m in moves]))
+    _, _, masks = move_tables(game.width, game.height)
+    free = ~game.get_blocked_mask()
+    h = game.height
+    return float(sum(popcount(masks[r + c * h] & free) for r, c in moves))
 
 def max_move_score(game, moves):
     score = 0.
     if len(moves):
-        score = float(np.max([len(game._Board__get_moves(m)) for m in moves]))
+        _, _, masks = move_tables(game.width, game.height)
+        free = ~game.get_blocked_mask()
+        h = game.height
+        score = float(max(popcount(masks[r + c * h] & free) for r, c in moves))
     return score
 
 def custom_score(game, player):
@@ -133,7 +147,7 @@ def custom_score_comb(game, player, alpha=1.0):
 
     return (len(own_moves) - len(opp_moves)) + alpha * (own_next_moves - opp_next_moves)
 
-def custom_score_adaptive(game, player, use_occ_on_move=False):
+def custom_score_adaptive(game, player, use_occ_on_move=False, weight=1.0):
     if game.is_loser(player):
         return float("-inf")
 
@@ -153,7 +167,6 @@ def custom_score_adaptive(game, player, use_occ_on_move=False):
     own_next_moves = weighted_move_score(game, own_moves)
     opp_next_moves = weighted_move_score(game, opp_moves)
 
-    weight = 1.0
     alpha,beta  = occupied,1.0-occupied
     if not use_occ_on_move:
         alpha, beta = beta, alpha
@@ -227,6 +240,354 @@ def custom_score_3(game, player, weight = 1.0):
     return own_next_moves - weight*opp_next_moves
 
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def symmetric_cache(maxsize=1 << 16):
+    """Decorator caching the values of a score function `score_fn(game,
+    player)` by `isolation.canonical_hash`, so that a position is evaluated
+    once for all its rotations and reflections.
+
+    The score function must give the same value to symmetric positions,
+    which holds for every heuristic of this file and of `sample_players`.
+    The cache keeps the `maxsize` most recently used values and, like
+    `functools.lru_cache`, the decorated function has the methods
+    `cache_info()` and `cache_clear()`.
+
+        player = AlphaBetaPlayer(score_fn=symmetric_cache()(custom_score))
+    """
+    def decorator(score_fn):
+        cache = OrderedDict()
+        counts = [0, 0]
+
+        @functools.wraps(score_fn)
+        def cached_score(game, player):
+            key = (game.width, game.height, canonical_hash(game, player))
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+                counts[0] += 1
+                return value
+            counts[1] += 1
+            value = cache[key] = score_fn(game, player)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+            return value
+
+        def cache_info():
+            return CacheInfo(counts[0], counts[1], maxsize, len(cache))
+
+        def cache_clear():
+            cache.clear()
+            counts[:] = [0, 0]
+
+        cached_score.cache_info = cache_info
+        cached_score.cache_clear = cache_clear
+        return cached_score
+    return decorator
+
+
+_NEIGHBOURS = {}
+
+def neighbour_table(width, height):
+    """Return a (width * height + 1) x 8 array listing the cells reachable by
+    a knight move from every cell. Rows are padded with the sentinel index
+    width * height, which `occupancy_array` always marks as blocked.
+    """
+    key = (width, height)
+    if key not in _NEIGHBOURS:
+        _, moves, _ = move_tables(width, height)
+        size = width * height
+        table = np.full((size + 1, 8), size, dtype=np.intp)
+        for idx, dests in enumerate(moves):
+            table[idx, :len(dests)] = dests
+        _NEIGHBOURS[key] = table
+    return _NEIGHBOURS[key]
+
+def occupancy_array(game):
+    """Return the blocked cells of the board as a boolean array, with an extra
+    blocked sentinel cell at the end (see `neighbour_table`).
+    """
+    size = game.width * game.height
+    raw = game.get_blocked_mask().to_bytes((size + 7) // 8, "little")
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), bitorder="little")
+    return np.append(bits[:size].astype(bool), True)
+
+def batch_features(game, player, moves):
+    """Compute the features used by the heuristics above for every child of
+    the current state, i.e. after the active player makes each of `moves`.
+    The opponent of the active player must already be on the board.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The parent game state.
+
+    player : object
+        The player the features are computed for.
+
+    moves : list<(int, int)>
+        Legal moves of the active player.
+
+    Returns
+    -------
+    (ndarray, ndarray, ndarray, ndarray, ndarray)
+        For every child: the number of legal moves of `player` and of its
+        opponent, the sums over those moves of the number of moves available
+        from there (see `weighted_move_score`), and the utility of the child
+        for `player` (+/-inf if the game is over, 0 otherwise).
+    """
+    size = game.width * game.height
+    table = neighbour_table(game.width, game.height)
+    h = game.height
+    r, c = game.get_player_location(game.inactive_player)
+    other = r + c * h
+    dests = np.array([r + c * h for r, c in moves], dtype=np.intp)
+
+    rows = np.arange(len(moves))
+    blocked = np.tile(occupancy_array(game), (len(moves), 1))
+    blocked[rows, dests] = True
+    free = ~blocked
+
+    # mobility of the player who just moved...
+    mover_nb = table[dests]
+    mover_free = free[rows[:, None], mover_nb]
+    mover_moves = mover_free.sum(axis=1)
+    mover_next = (free[rows[:, None, None], table[mover_nb]].sum(axis=2) * mover_free).sum(axis=1)
+
+    # ...and of the player now holding initiative
+    other_nb = table[other]
+    other_free = free[:, other_nb]
+    other_moves = other_free.sum(axis=1)
+    other_next = (free[rows[:, None, None], table[other_nb][None]].sum(axis=2) * other_free).sum(axis=1)
+
+    if player == game.active_player:
+        outcome = np.where(other_moves == 0, float("inf"), 0.)
+        return mover_moves, other_moves, mover_next, other_next, outcome
+    outcome = np.where(other_moves == 0, float("-inf"), 0.)
+    return other_moves, mover_moves, other_next, mover_next, outcome
+
+def batch_weighted_score(game, player, moves, weight):
+    """`weighted_score` of every child, computed with `batch_features`."""
+    own, opp, _, _, outcome = batch_features(game, player, moves)
+    return np.where(outcome != 0, outcome, own - weight * opp)
+
+def batch_custom_score_comb(game, player, moves, alpha=1.0):
+    """`custom_score_comb` of every child, computed with `batch_features`."""
+    own, opp, own_next, opp_next, outcome = batch_features(game, player, moves)
+    return np.where(outcome != 0, outcome, (own - opp) + alpha * (own_next - opp_next))
+
+def batch_custom_score_adaptive(game, player, moves, use_occ_on_move=False, weight=1.0):
+    """`custom_score_adaptive` of every child, computed with `batch_features`."""
+    own, opp, own_next, opp_next, outcome = batch_features(game, player, moves)
+    # one more cell is blocked in every child
+    occupied = float(len(game.get_blank_spaces()) - 1) / (game.width * game.height)
+    occupied = min(occupied, 0.8)
+    alpha, beta = occupied, 1.0 - occupied
+    if not use_occ_on_move:
+        alpha, beta = beta, alpha
+    scores = alpha * (own - weight * opp) + beta * (own_next - weight * opp_next)
+    return np.where(outcome != 0, outcome, scores)
+
+def batch_custom_score(game, player, moves):
+    """`custom_score` of every child, computed with `batch_features`."""
+    return batch_custom_score_comb(game, player, moves, 2.0)
+
+def batch_custom_score_2(game, player, moves, weight=1.5):
+    """`custom_score_2` of every child, computed with `batch_features`."""
+    return batch_weighted_score(game, player, moves, weight)
+
+def batch_custom_score_3(game, player, moves, weight=1.0):
+    """`custom_score_3` of every child, computed with `batch_features`."""
+    _, _, own_next, opp_next, outcome = batch_features(game, player, moves)
+    return np.where(outcome != 0, outcome, own_next - weight * opp_next)
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by `Board.hash()`.
+
+    Each slot holds the last entry stored at `key % size` as a tuple
+    (key, depth, value, bound, move); storing a different key into an
+    occupied slot evicts the previous entry.
+
+    Parameters
+    ----------
+    size : int
+        The number of slots in the table.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, size):
+        self.size = size
+        self.slots = [None] * size
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Drop all entries, keeping the counters."""
+        self.slots = [None] * self.size
+
+    def lookup(self, key):
+        """Return the entry stored for `key`, or None."""
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        """Store the result of searching the position `key` to `depth`."""
+        idx = key % self.size
+        old = self.slots[idx]
+        if old is not None and old[0] != key:
+            self.evictions += 1
+        self.slots[idx] = (key, depth, value, bound, move)
+        self.stores += 1
+
+    def counters(self):
+        """Return a snapshot of the hit/miss/cutoff/store/eviction counters."""
+        return {"hits": self.hits, "misses": self.misses, "cutoffs": self.cutoffs,
+                "stores": self.stores, "evictions": self.evictions}
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Transposition table stored in an anonymous shared memory mapping, so
+    that processes forked after its creation read and write the same slots.
+
+    Each slot holds three unsigned 64-bit words: a check word, the packed
+    depth, bound and move, and the bits of the value. The check word is the
+    key xor-ed with the other two, so an entry torn by concurrent writes
+    from two processes fails the key comparison and reads as a miss instead
+    of returning mixed data; no lock is needed. The counters are local to
+    each process.
+
+    Parameters
+    ----------
+    size : int
+        The number of slots in the table.
+    """
+    _FILLED = 1 << 63
+    _DOUBLE = struct.Struct("<d")
+    _QWORD = struct.Struct("<Q")
+
+    def __init__(self, size):
+        TranspositionTable.__init__(self, 0)
+        self.size = size
+        self._mmap = mmap.mmap(-1, 24 * size)
+        self._words = memoryview(self._mmap).cast("Q")
+
+    def __deepcopy__(self, memo):
+        # a copy gets its own mapping, shared with its own forked processes
+        return SharedTranspositionTable(self.size)
+
+    def clear(self):
+        """Drop all entries, keeping the counters."""
+        self._mmap[:] = bytes(24 * self.size)
+
+    def lookup(self, key):
+        """Return the entry stored for `key`, or None."""
+        j = 3 * (key % self.size)
+        words = self._words
+        check, meta, bits = words[j], words[j + 1], words[j + 2]
+        if meta & self._FILLED and check ^ meta ^ bits == key:
+            self.hits += 1
+            cell = (meta >> 16) & 0xffff
+            move = (cell & 0xff) - 1, (cell >> 8) - 1
+            value = self._DOUBLE.unpack(self._QWORD.pack(bits))[0]
+            return key, meta & 0xff, value, (meta >> 8) & 0xff, move
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        """Store the result of searching the position `key` to `depth`."""
+        j = 3 * (key % self.size)
+        words = self._words
+        old_meta = words[j + 1]
+        if old_meta & self._FILLED and words[j] ^ old_meta ^ words[j + 2] != key:
+            self.evictions += 1
+        meta = self._FILLED | depth | bound << 8 | ((move[0] + 1) | (move[1] + 1) << 8) << 16
+        bits = self._QWORD.unpack(self._DOUBLE.pack(value))[0]
+        words[j + 1] = meta
+        words[j + 2] = bits
+        words[j] = key ^ meta ^ bits
+        self.stores += 1
+
+
+class SearchStats:
+    """Counters of the searches run by a player, accumulated over all its
+    `get_move` calls since it was created or last `reset`.
+
+    Attributes
+    ----------
+    moves : int
+        The number of `get_move` calls.
+
+    nodes : int
+        The number of search nodes expanded.
+
+    heuristic_calls : int
+        The number of positions evaluated by the score function.
+
+    timeouts : int
+        The number of moves whose search was aborted by `SearchTimeout`.
+
+    cutoffs : dict<int, int>
+        The number of alpha-beta cutoffs at each ply below the root.
+
+    depths : list<int>
+        The depth of the deepest completed search of each move (0 when the
+        move was not searched, e.g. a book move).
+
+    iteration_ms : list<list<float>>
+        The time in milliseconds of each completed search iteration of each
+        move.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Set all counters to zero."""
+        self.moves = 0
+        self.nodes = 0
+        self.heuristic_calls = 0
+        self.timeouts = 0
+        self.cutoffs = {}
+        self.depths = []
+        self.iteration_ms = []
+
+    def add_cutoff(self, ply):
+        """Count an alpha-beta cutoff at `ply`."""
+        self.cutoffs[ply] = self.cutoffs.get(ply, 0) + 1
+
+    def end_move(self, depth, iteration_ms, timed_out):
+        """Record the depth reached and iteration times of a move."""
+        self.moves += 1
+        self.depths.append(depth)
+        self.iteration_ms.append(iteration_ms)
+        if timed_out:
+            self.timeouts += 1
+
+    def to_dict(self):
+        """Return the counters as a dictionary that can be dumped to json."""
+        search_ms = sum(sum(times) for times in self.iteration_ms)
+        return {
+            "moves": self.moves,
+            "nodes": self.nodes,
+            "heuristic_calls": self.heuristic_calls,
+            "timeouts": self.timeouts,
+            "cutoffs": dict(self.cutoffs),
+            "depths": list(self.depths),
+            "mean_depth": float(sum(self.depths)) / self.moves if self.moves else 0.,
+            "iteration_ms": [list(times) for times in self.iteration_ms],
+            "nps": 1000. * self.nodes / search_ms if search_ms > 0 else 0.,
+        }
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
@@ -248,24 +609,80 @@ class IsolationPlayer:
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    poll_interval : int or "auto" (optional)
+        Number of calls to `check_time` between two reads of the clock. With
+        "auto", the interval is tuned at every read from the measured time per
+        node so that the next read is due after at most half of the time left
+        above `TIMER_THRESHOLD`; it shrinks to one node as the deadline nears,
+        so the search never runs past the threshold by more than the current
+        node.
     """
-    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.):
+    MAX_POLL_INTERVAL = 4096
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., poll_interval=1):
         self.search_depth = search_depth
         self.score = score_fn
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.poll_interval = poll_interval
+        self.reset_polling()
+
+    def reset_polling(self):
+        """Read the clock at the next `check_time`, forgetting the time per
+        node measured during the previous turn.
+        """
+        self._countdown = 0
+        self._interval = 1
+        self._last_time_left = None
+        self._ms_per_node = 0.
+        self.clock_reads = 0
 
     def check_time(self):
-        if self.time_left() < self.TIMER_THRESHOLD:
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._poll_clock()
+
+    def _poll_clock(self):
+        """Read the clock, raise `SearchTimeout` past the threshold, and set
+        the number of nodes until the next read.
+        """
+        time_left = self.time_left()
+        self.clock_reads += 1
+        slack = time_left - self.TIMER_THRESHOLD
+        if slack < 0:
             raise SearchTimeout()
+        if self.poll_interval != "auto":
+            self._countdown = self.poll_interval
+            return
+
+        if self._last_time_left is not None:
+            # the estimate rises immediately but decays slowly, so that a
+            # stretch of cheap nodes does not make the next interval too long
+            ms_per_node = (self._last_time_left - time_left) / self._interval
+            self._ms_per_node = max(ms_per_node, 0.75 * self._ms_per_node + 0.25 * ms_per_node)
+        self._last_time_left = time_left
+        if self._ms_per_node > 0:
+            interval = int(slack / (2 * self._ms_per_node))
+            self._interval = max(1, min(interval, self.MAX_POLL_INTERVAL))
+        else:
+            self._interval = 1
+        self._countdown = self._interval
 
 
 class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    The player counts its nodes, score function calls and timeouts in the
+    `SearchStats` object `stats`.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., poll_interval=1):
+        IsolationPlayer.__init__(self, search_depth, score_fn, timeout, poll_interval)
+        self.stats = SearchStats()
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -295,18 +712,22 @@ class MinimaxPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.reset_polling()
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        start = time_left()
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            best_move = self.minimax(game, self.search_depth)
+            self.stats.end_move(self.search_depth, [start - time_left()], False)
+            return best_move
 
         except SearchTimeout:
-            pass  # Handle any actions required after timeout as needed
+            self.stats.end_move(0, [], True)  # Handle any actions required after timeout as needed
 
         # Return the best move from the last completed search iteration
         return best_move
@@ -370,12 +791,14 @@ class MinimaxPlayer(IsolationPlayer):
         """
         # check for time
         self.check_time()
+        self.stats.nodes += 1
 
         #player (self) try to maximize outcome
         player = self
 
         # if search_depth >= fixed depth => return evaluation function
         if depth == 0:
+            self.stats.heuristic_calls += 1
             return self.score(game, self), (-1, -1)
 
         # search next layer
@@ -402,12 +825,14 @@ class MinimaxPlayer(IsolationPlayer):
         """
         # check for time
         self.check_time()
+        self.stats.nodes += 1
 
         # evaluate utility
         player = game.get_opponent(self)    # opponent try to minimize outcome
 
         # if search_depth >= fixed depth => return evaluation function: always score with self
         if depth == 0:
+            self.stats.heuristic_calls += 1
             return self.score(game, self)
 
         # search next layer
@@ -424,8 +849,89 @@ class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    The player counts its nodes, cutoffs, score function calls, depths,
+    iteration times and timeouts in the `SearchStats` object `stats`.
+
+    Parameters
+    ----------
+    inplace : bool (optional)
+        If True, the search walks the game tree on a single board using
+        `push_move`/`pop_move` instead of allocating a new board with
+        `forecast_move` for every child node.
+
+    tt_size : int (optional)
+        Number of slots of the transposition table consulted by `alphabeta`;
+        0 disables the table. The table is cleared at the start of every
+        `get_move` call because its values are scored from this player's
+        point of view, while the Zobrist key only tells whether player 1 or
+        player 2 is to move, not which of them this player is. One player
+        object plays both sides across the games of a tournament, so a table
+        kept from an earlier game would return values with the wrong sign,
+        and the player cannot tell when a new game starts.
+
+    move_ordering : bool (optional)
+        If True, children are searched in the order: move of the principal
+        variation (PV) found by the previous deepening iteration, move stored
+        in the transposition table, killer moves for the ply, then the
+        remaining moves by decreasing history score.
+
+    batch_score_fn : callable (optional)
+        A function `batch_score_fn(game, player, moves)` returning the same
+        values as `score_fn` for all children of `game` at once (e.g.
+        `batch_custom_score`). If given, it is used to evaluate the whole
+        leaf layer of the search below each depth-one node in one call.
+
+    endgame : bool (optional)
+        If True, once no open cell can be reached by both players the move is
+        chosen by the exact `isolation.EndgameSolver` instead of the search:
+        each player then walks the longest path of its own region.
+
+    opening_book : object (optional)
+        An object with a method `lookup(game)` returning the move to play in
+        `game`, or None if the position is not in the book (e.g. an
+        `opening_book.OpeningBook`). Book moves are played without searching.
+
+    poll_interval : int or "auto" (optional)
+        Number of nodes between two reads of the clock (see
+        `IsolationPlayer`).
+
+    tablebase : object (optional)
+        An endgame tablebase with methods `probe(game)`, returning (win,
+        distance) for the player to move or None if the position is not in
+        the table, `covers(game)` and `best_move(game)` (e.g. a
+        `tablebase.Tablebase`). Positions in the table are played from it
+        without searching, and the search scores the positions it reaches
+        in the table as won or lost instead of expanding them.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., inplace=False,
+                 tt_size=0, move_ordering=False, batch_score_fn=None, endgame=False,
+                 opening_book=None, poll_interval=1, tablebase=None):
+        IsolationPlayer.__init__(self, search_depth, score_fn, timeout, poll_interval)
+        self.opening_book = opening_book
+        self.tablebase = tablebase
+        self.endgame = endgame
+        self._solver = None
+        self.inplace = inplace
+        self.batch_score = batch_score_fn
+        self.tt = TranspositionTable(tt_size) if tt_size else None
+        # TT counters after each completed iterative deepening iteration
+        # of the last get_move() call, as a list of (depth, counters)
+        self.tt_history = []
+
+        self.move_ordering = move_ordering
+        self.nodes = 0
+        self._root_depth = 0
+        self._pv = []
+        self._pv_lines = []
+        self._killers = []
+        self._history = {}
+        # one entry per completed iteration of the last get_move() call
+        # with keys depth, nodes, time_ms, nps and ebf
+        self.depth_report = []
+        self.stats = SearchStats()
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -457,19 +963,90 @@ class AlphaBetaPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.reset_polling()
+
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(game)
+            if move is not None and game.move_is_legal(move):
+                self.stats.end_move(0, [], False)
+                return move
+
+        if self.tablebase is not None and self.tablebase.covers(game):
+            best_move, _ = self.tablebase.best_move(game)
+            self.stats.end_move(0, [], False)
+            return best_move
+
+        # search on a private board so a timeout in the middle of an in-place
+        # line never leaves the caller's board modified
+        if self.inplace:
+            game = game.copy()
+
+        if self.tt is not None:
+            self.tt.clear()
+        self.tt_history = []
+        self.depth_report = []
+        self._pv = []
+        self._killers = []
+        # age the history scores so older moves weigh less than recent ones
+        self._history = {k: v // 2 for k, v in self._history.items() if v > 1}
+
+        if self.endgame:
+            if self._solver is None or (self._solver.width, self._solver.height) != (game.width, game.height):
+                self._solver = EndgameSolver(game.width, game.height)
+            if self._solver.is_partitioned(game):
+                best_move = self._endgame_move(game)
+                self.stats.end_move(0, [], self.time_left() < self.TIMER_THRESHOLD)
+                return best_move
 
         # TODO: finish this function!
         depth = 1
         best_move = (-1, -1)
-        while (True):
+        max_depth = len(game.get_blank_spaces())
+        nodes_start = self.nodes
+        timed_out = False
+        while depth <= max_depth:
+            nodes_before = self.nodes
+            start = time_left()
             try:
                 best_move = self.alphabeta(game, depth)
-                depth += 1
             except SearchTimeout:
+                timed_out = True
                 break
+            if self.tt is not None:
+                self.tt_history.append((depth, self.tt.counters()))
+            self._report_iteration(depth, self.nodes - nodes_before, start - time_left())
+            depth += 1
+
+        self.stats.nodes += self.nodes - nodes_start
+        self.stats.end_move(depth - 1, [r["time_ms"] for r in self.depth_report], timed_out)
+        return best_move
 
+    def _endgame_move(self, game):
+        """Return the move chosen by the endgame solver in a partitioned
+        position, or the best move it found before the time ran out.
+        """
+        moves = game.get_legal_moves()
+        best_move = moves[0] if moves else (-1, -1)
+        try:
+            for best_move, _ in self._solver.search_moves(game, self.check_time):
+                pass
+        except SearchTimeout:
+            pass
         return best_move
 
+    def _report_iteration(self, depth, nodes, elapsed_ms):
+        """Record the node count, nodes/second and effective branching factor
+        (ratio of the node counts of successive iterations) of an iteration.
+        """
+        prev_nodes = self.depth_report[-1]["nodes"] if self.depth_report else 0
+        self.depth_report.append({
+            "depth": depth,
+            "nodes": nodes,
+            "time_ms": elapsed_ms,
+            "nps": 1000. * nodes / elapsed_ms if elapsed_ms > 0 else float("inf"),
+            "ebf": float(nodes) / prev_nodes if prev_nodes else float(nodes),
+        })
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -521,62 +1098,322 @@ class AlphaBetaPlayer(IsolationPlayer):
         # print('Game state')
         # print(game.to_string())
         # print('-------------------------------')
+        self._root_depth = depth
+        if self.move_ordering:
+            self._pv_lines = [[] for _ in range(depth + 1)]
+            self._killers.extend([] for _ in range(depth + 1 - len(self._killers)))
+
         _, best_move = self.maxval(game, depth, alpha, beta)
         # print(best_move)
         # print('-------------------------------\n')
 
+        if self.move_ordering:
+            self._pv = self._pv_lines[0]
+
         return best_move
 
+    def _can_batch(self, game, moves):
+        """Test whether the children of `game` can be scored with one call
+        to the batch score function, which needs both players on the board.
+        """
+        return (self.batch_score is not None and len(moves) > 0 and
+                game.get_player_location(game.inactive_player) is not None)
+
+    def _legal_moves(self, game, player):
+        """Return the legal moves of `player` in the order they are searched
+        before move ordering.
+        """
+        return game.get_legal_moves(player)
+
+    def _order_moves(self, moves, ply, tt_move, maximizing):
+        """Sort moves so that the most promising ones are searched first."""
+        pv_move = self._pv[ply] if ply < len(self._pv) else None
+        killers = self._killers[ply]
+        history = self._history
+
+        def priority(m):
+            if m == pv_move:
+                return 3, 0
+            if m == tt_move:
+                return 2, 0
+            if m in killers:
+                return 1, 0
+            return 0, history.get((maximizing, m), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _record_cutoff(self, move, ply, depth, maximizing):
+        """Update the killer moves and history scores after a cutoff."""
+        killers = self._killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (maximizing, move)
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
     def maxval(self, game, depth, alpha, beta):
         self.check_time()
+        self.nodes += 1
 
         # we try to maximize outcome
         player = self
+        ply = self._root_depth - depth
+        if self.move_ordering:
+            self._pv_lines[ply] = []
+
+        if self.tablebase is not None and ply > 0:
+            result = self.tablebase.probe(game)
+            if result is not None:
+                return (float("inf") if result[0] else float("-inf")), (-1, -1)
 
         # if search_depth >= fixed depth => return evaluation function
         if depth == 0:
+            self.stats.heuristic_calls += 1
             return self.score(game, self), (-1, -1)
 
+        tt_move = None
+        if self.tt is not None:
+            key = game.hash()
+            entry = self.tt.lookup(key)
+            if entry is not None:
+                _, tt_depth, value, bound, tt_move = entry
+                if tt_depth >= depth and (
+                        bound == TranspositionTable.EXACT or
+                        (bound == TranspositionTable.LOWER and value >= beta) or
+                        (bound == TranspositionTable.UPPER and value <= alpha)):
+                    self.tt.cutoffs += 1
+                    return value, tt_move
+            alpha_orig = alpha
+
+        moves = self._legal_moves(game, player)
+
         # search next layer
         # if there is no legal moves then we lose => return -inf
         max_val = float("-inf")
         max_move = (-1, -1)
-        for m in game.get_legal_moves(player):
-            v = self.minval(game.forecast_move(m), depth - 1, alpha, beta)
+        if depth == 1 and self._can_batch(game, moves):
+            # evaluate all leaves at once
+            self.nodes += len(moves)
+            self.stats.heuristic_calls += len(moves)
+            scores = self.batch_score(game, self, moves)
+            i = int(np.argmax(scores))
+            max_val, max_move = float(scores[i]), moves[i]
+            if self.move_ordering and alpha < max_val < beta:
+                self._pv_lines[ply] = [max_move]
+            moves = []
+        elif self.move_ordering:
+            moves = self._order_moves(moves, ply, tt_move, True)
+
+        for m in moves:
+            if self.inplace:
+                game.push_move(m)
+                v = self.minval(game, depth - 1, alpha, beta)
+                game.pop_move()
+            else:
+                v = self.minval(game.forecast_move(m), depth - 1, alpha, beta)
             if v > max_val:
                 max_val = v
                 max_move = m
 
                 if max_val >= beta:
-                    return max_val, max_move
+                    self.stats.add_cutoff(ply)
+                    if self.move_ordering:
+                        self._record_cutoff(m, ply, depth, True)
+                    break
+
+                if self.move_ordering and max_val > alpha:
+                    self._pv_lines[ply] = [m] + self._pv_lines[ply + 1]
 
             alpha = max(alpha, max_val)
 
+        if self.tt is not None:
+            if max_val <= alpha_orig:
+                bound = TranspositionTable.UPPER
+            elif max_val >= beta:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+            self.tt.store(key, depth, max_val, bound, max_move)
+
         return max_val, max_move
 
     def minval(self, game, depth, alpha, beta):
         self.check_time()
+        self.nodes += 1
 
         # evaluate utility
         player = game.get_opponent(self)  # opponent try to minimize outcome
+        ply = self._root_depth - depth
+        if self.move_ordering:
+            self._pv_lines[ply] = []
+
+        # the opponent is to move
+        if self.tablebase is not None:
+            result = self.tablebase.probe(game)
+            if result is not None:
+                return float("-inf") if result[0] else float("inf")
 
         # if search_depth >= fixed depth => return evaluation function: always score with self
         if depth == 0:
+            self.stats.heuristic_calls += 1
             return self.score(game, self)
 
+        tt_move = None
+        if self.tt is not None:
+            key = game.hash()
+            entry = self.tt.lookup(key)
+            if entry is not None:
+                _, tt_depth, value, bound, tt_move = entry
+                if tt_depth >= depth and (
+                        bound == TranspositionTable.EXACT or
+                        (bound == TranspositionTable.LOWER and value >= beta) or
+                        (bound == TranspositionTable.UPPER and value <= alpha)):
+                    self.tt.cutoffs += 1
+                    return value
+            beta_orig = beta
+
+        moves = self._legal_moves(game, player)
+
         # search next layer
         # if there is no legal moves then we win => return inf
         min_val = float("inf")
-        # print('\tLegal moves {}'.format(legal_moves))
-        for m in game.get_legal_moves(player):
-            v, _ = self.maxval(game.forecast_move(m), depth - 1, alpha, beta)
+        min_move = (-1, -1)
+        if depth == 1 and self._can_batch(game, moves):
+            # evaluate all leaves at once
+            self.nodes += len(moves)
+            self.stats.heuristic_calls += len(moves)
+            scores = self.batch_score(game, self, moves)
+            i = int(np.argmin(scores))
+            min_val, min_move = float(scores[i]), moves[i]
+            if self.move_ordering and alpha < min_val < beta:
+                self._pv_lines[ply] = [min_move]
+            moves = []
+        elif self.move_ordering:
+            moves = self._order_moves(moves, ply, tt_move, False)
+
+        for m in moves:
+            if self.inplace:
+                game.push_move(m)
+                v, _ = self.maxval(game, depth - 1, alpha, beta)
+                game.pop_move()
+            else:
+                v, _ = self.maxval(game.forecast_move(m), depth - 1, alpha, beta)
             if v < min_val:
                 min_val = v
+                min_move = m
                 if min_val <= alpha:
-                    return  min_val
+                    self.stats.add_cutoff(ply)
+                    if self.move_ordering:
+                        self._record_cutoff(m, ply, depth, False)
+                    break
+
+                if self.move_ordering and min_val < beta:
+                    self._pv_lines[ply] = [m] + self._pv_lines[ply + 1]
 
             beta = min(beta, min_val)
 
-        # print('min val alpha-beta {}'.format(alpha_beta))
+        if self.tt is not None:
+            if min_val >= beta_orig:
+                bound = TranspositionTable.LOWER
+            elif min_val <= alpha:
+                bound = TranspositionTable.UPPER
+            else:
+                bound = TranspositionTable.EXACT
+            self.tt.store(key, depth, min_val, bound, min_move)
+
         return min_val
 
+
+class LazySMPPlayer(AlphaBetaPlayer):
+    """Alpha-beta player searching with several processes that share one
+    transposition table ("lazy SMP").
+
+    When the iterative deepening search of a move starts, `workers - 1`
+    helper processes are forked. Each helper runs its own iterative
+    deepening search of the same position until the player returns, only to
+    fill the shared table: odd helpers start one ply deeper than the player
+    (staggered depths) and every helper shuffles the moves of every node
+    with its own `random.Random(idx)` before move ordering, so the subtrees
+    searched first differ between processes whatever the board class (a
+    `BitBoard` returns its moves in a fixed order). The player's own search
+    then cuts off on the entries
+    written by the helpers and reaches deeper iterations in the same time.
+    The helpers are killed before `get_move` returns; torn table entries
+    are rejected by `SharedTranspositionTable`.
+
+    Helpers only pay off with more than one core. On platforms without
+    `os.fork` the player searches alone.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        The number of searching processes, this player included.
+
+    Other parameters are those of `AlphaBetaPlayer`; `tt_size` must be
+    positive.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., workers=2,
+                 tt_size=1 << 16, **kwargs):
+        if tt_size <= 0:
+            raise ValueError("LazySMPPlayer needs a transposition table")
+        AlphaBetaPlayer.__init__(self, search_depth, score_fn, timeout, **kwargs)
+        self.tt = SharedTranspositionTable(tt_size)
+        self.workers = workers if hasattr(os, "fork") else 1
+        # pids of the running helpers, or None outside of get_move()
+        self._helpers = None
+        # move shuffler of a helper process, None in the player itself
+        self._move_rng = None
+
+    def get_move(self, game, time_left):
+        self._helpers = []
+        try:
+            return AlphaBetaPlayer.get_move(self, game, time_left)
+        finally:
+            self._stop_helpers()
+
+    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
+        if self._helpers == [] and self.workers > 1:
+            self._start_helpers(game)
+        return AlphaBetaPlayer.alphabeta(self, game, depth, alpha, beta)
+
+    def _start_helpers(self, game):
+        for idx in range(1, self.workers):
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    self._helper_search(game, idx)
+                except BaseException:
+                    status = 1
+                finally:
+                    os._exit(status)
+            self._helpers.append(pid)
+
+    def _helper_search(self, game, idx):
+        """Iteratively deepen the search of `game` until the time runs out."""
+        self._move_rng = random.Random(idx)
+        self._helpers = None
+        depth = 1 + idx % 2
+        max_depth = len(game.get_blank_spaces())
+        try:
+            while depth <= max_depth:
+                AlphaBetaPlayer.alphabeta(self, game, depth)
+                depth += 1
+        except SearchTimeout:
+            pass
+
+    def _legal_moves(self, game, player):
+        moves = game.get_legal_moves(player)
+        if self._move_rng is not None:
+            self._move_rng.shuffle(moves)
+        return moves
+
+    def _stop_helpers(self):
+        for pid in self._helpers or []:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self._helpers = None
@@ -0,0 +1,277 @@
+"""
+This file contains the `BitBoard` class, a drop-in replacement for
+`isolation.Board` that stores the blocked cells in a single integer and
+generates knight moves from tables precomputed once per board size.
+
+Cells are indexed exactly as in `Board._board_state`, i.e. the cell at
+(row, column) has index `row + column * height`, so bit `idx` of the
+occupancy integer is set iff `Board._board_state[idx]` is non-blank.
+"""
+from .isolation import Board, move_tables, zobrist_keys
+
+
+def popcount(bits):
+    """Count the number of set bits in a non-negative integer."""
+    return bin(bits).count("1")
+
+
+class BitBoard(Board):
+    """Bitboard implementation of the game Isolation with knight moves.
+
+    The public interface is identical to `isolation.Board`, so a `BitBoard`
+    can be passed to any player or tournament code that expects a `Board`.
+    Unlike `Board`, legal moves are returned in a fixed order rather than
+    shuffled.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        self._coords, _, self._masks = move_tables(width, height)
+        self._full = (1 << (width * height)) - 1
+        # blocked cells as a bitmask, and the cell index of each player
+        # (None until the player has moved)
+        self._occupied = 0
+        self._locs = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
+        self._undo = []
+        self._zobrist = zobrist_keys(width * height)
+        self._hash = 0
+
+    @classmethod
+    def from_board(cls, board):
+        """Return a `BitBoard` with the same players and game state as the
+        input `isolation.Board`.
+        """
+        new_board = cls(board._player_1, board._player_2,
+                        width=board.width, height=board.height)
+        new_board.move_count = board.move_count
+        new_board._active_player = board._active_player
+        new_board._inactive_player = board._inactive_player
+        state = board._board_state
+        for idx in range(board.width * board.height):
+            if state[idx] != Board.BLANK:
+                new_board._occupied |= 1 << idx
+        new_board._locs[board._player_1] = state[-1]
+        new_board._locs[board._player_2] = state[-2]
+        new_board._hash = board.hash()
+        return new_board
+
+    def hash(self):
+        return self._hash
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = BitBoard.__new__(BitBoard)
+        new_board.__dict__.update(self.__dict__)
+        new_board._locs = dict(self._locs)
+        new_board._undo = []
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._occupied >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._to_moves(self._full & ~self._occupied)
+
+    def get_blocked_mask(self):
+        """Return the blocked cells as an integer bitmask."""
+        return self._occupied
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        if player not in self._locs:
+            raise RuntimeError(
+                "Invalid player in get_player_location: {}".format(player))
+        idx = self._locs[player]
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coords[idx]
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        return self._to_moves(self._legal_mask(player))
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        blocked, locations, side = self._zobrist
+        loc_keys = locations[self._active_player is self._player_2]
+        prev_idx = self._locs[self._active_player]
+        if prev_idx != Board.NOT_MOVED:
+            self._hash ^= loc_keys[prev_idx]
+        self._hash ^= blocked[idx] ^ loc_keys[idx] ^ side
+        self._occupied |= 1 << idx
+        self._locs[self._active_player] = idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def push_move(self, move):
+        """Apply a move in-place like `apply_move`, remembering enough of the
+        previous state that it can be undone with `pop_move`.
+        """
+        self._undo.append((self._locs[self._active_player], self._hash))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the most recent move applied with `push_move`."""
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        self._occupied &= ~(1 << self._locs[self._active_player])
+        self._locs[self._active_player], self._hash = self._undo.pop()
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self._legal_mask(self._active_player)
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self._legal_mask(self._active_player)
+
+    def utility(self, player):
+        """Returns the utility of the current game state from the perspective
+        of the specified player.
+
+        See `Board.utility` for details.
+        """
+        if not self._legal_mask(self._active_player):
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
+
+    def _legal_mask(self, player):
+        """Return the legal moves of the specified player as a bitmask."""
+        idx = self._locs[player]
+        if idx == Board.NOT_MOVED:
+            return self._full & ~self._occupied
+        return self._masks[idx] & ~self._occupied
+
+    def _to_moves(self, bits):
+        """Convert a bitmask of cells into a list of (row, column) pairs."""
+        coords = self._coords
+        moves = []
+        while bits:
+            low = bits & -bits
+            moves.append(coords[low.bit_length() - 1])
+            bits ^= low
+        return moves
+
+    def _get_moves(self, loc):
+        """Generate the list of possible moves for an L-shaped motion (like a
+        knight in chess) from the input location.
+        """
+        if loc == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+        return self._to_moves(self._masks[loc[0] + loc[1] * self.height] & ~self._occupied)
+
+    # heuristics in game_agent.py call the name-mangled Board.__get_moves
+    _Board__get_moves = _get_moves
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        p1_loc = self._locs[self._player_1]
+        p2_loc = self._locs[self._player_2]
+
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._occupied >> idx & 1:
+                    out += ' '
+                elif p1_loc == idx:
+                    out += symbols[0]
+                elif p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+        if self._active_player == self._player_1:
+            out = 'Active player 1\n' + out
+        else:
+            out = 'Active player 2\n' + out
+        return out
+
@@ -0,0 +1,67 @@
+"""
+This file contains the clocks that `Board.play` can use to time each turn.
+A clock is any callable that takes no arguments and returns the current time
+in milliseconds; the time left for a turn is the time limit minus the time
+elapsed on the clock since the turn started.
+"""
+import time
+import timeit
+
+# per-thread CPU time is not available before Python 3.7
+_cpu_time = getattr(time, "thread_time", time.process_time)
+
+
+def wall_clock():
+    """Return the wall-clock time in milliseconds. This is the default clock,
+    and it charges a player for the time other processes hold the CPU.
+    """
+    return 1000 * timeit.default_timer()
+
+
+def cpu_clock():
+    """Return the CPU time of the calling thread in milliseconds, so that a
+    player is only charged for the time it actually runs, however many
+    matches share the machine.
+    """
+    return 1000 * _cpu_time()
+
+
+class NodeBudgetClock:
+    """Deterministic clock that advances by a fixed amount every time it is
+    read.
+
+    Agents read the clock (through the `time_left` function passed to
+    `get_move`) once per search node, so the time limit of a turn becomes a
+    budget of search nodes that is independent of machine speed and load,
+    and games replay identically.
+
+    Parameters
+    ----------
+    ms_per_call : float
+        The number of milliseconds charged every time the clock is read.
+    """
+
+    def __init__(self, ms_per_call):
+        self.ms_per_call = ms_per_call
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls * self.ms_per_call
+
+    @classmethod
+    def calibrate(cls, player, game, time_limit=150):
+        """Return a clock charging the average wall-clock time between two
+        reads of the clock while `player` searches its move in `game`, so
+        that the node budget matches `time_limit` on this machine.
+        """
+        calls = [0]
+        move_start = wall_clock()
+
+        def time_left():
+            calls[0] += 1
+            return time_limit - (wall_clock() - move_start)
+
+        player.get_move(game.copy(), time_left)
+        elapsed = wall_clock() - move_start
+        return cls(elapsed / max(calls[0], 1))
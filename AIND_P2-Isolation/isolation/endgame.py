@@ -0,0 +1,228 @@
+"""
+This file contains the `EndgameSolver` class, which plays Isolation exactly
+once the two players are separated.
+
+When no open cell can be reached by both players, their moves no longer
+interact: each player simply walks the longest knight path available in its
+own region, and the player to move wins iff its longest path is strictly
+longer than the opponent's. Regions are represented as integer bitmasks with
+the cell indexing of `Board._board_state` (`row + column * height`).
+"""
+from .isolation import move_tables
+from .bitboard import popcount
+
+
+def reachable(masks, free, start):
+    """Return the bitmask of the cells in `free` that can be reached from
+    cell index `start` by a sequence of knight moves through `free`.
+
+    Parameters
+    ----------
+    masks : list<int>
+        The knight move bitmask of every cell index (see `move_tables`).
+
+    free : int
+        Bitmask of the open cells.
+
+    start : int
+        Cell index of the starting cell; it is not included in the result
+        unless it can be reached again.
+    """
+    region = 0
+    frontier = masks[start] & free
+    while frontier:
+        region |= frontier
+        bits = frontier
+        frontier = 0
+        while bits:
+            low = bits & -bits
+            frontier |= masks[low.bit_length() - 1]
+            bits ^= low
+        frontier &= free & ~region
+    return region
+
+
+class EndgameSolver:
+    """Exact solver for the endgame of Isolation on a board of a given size.
+
+    Longest path lengths are memoized on (cell index, region bitmask), where
+    the region is the set of open cells still reachable from the cell, so
+    positions reached from different move orders share their entries, and
+    entries computed during one turn are reused in the following turns.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    max_entries : int (optional)
+        The memo is cleared whenever it grows beyond this many entries.
+    """
+
+    def __init__(self, width, height, max_entries=1000000):
+        self.width = width
+        self.height = height
+        self.max_entries = max_entries
+        self._coords, _, self._masks = move_tables(width, height)
+        self._full = (1 << (width * height)) - 1
+        # knight moves always change the colour of the square
+        self._light = 0
+        for idx, (r, c) in enumerate(self._coords):
+            if (r + c) % 2 == 0:
+                self._light |= 1 << idx
+        self._memo = {}
+        self.nodes = 0
+
+    def clear(self):
+        """Remove all memoized path lengths."""
+        self._memo = {}
+
+    def regions(self, game):
+        """Return the cell index and region bitmask of the active player and
+        of the inactive player, or None if either player has not moved yet.
+        """
+        free = self._full & ~game.get_blocked_mask()
+        result = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            if loc is None:
+                return None
+            idx = loc[0] + loc[1] * self.height
+            result.append((idx, reachable(self._masks, free, idx)))
+        return result
+
+    def is_partitioned(self, game):
+        """Test whether no open cell can be reached by both players."""
+        regions = self.regions(game)
+        return regions is not None and not regions[0][1] & regions[1][1]
+
+    def bound(self, idx, region):
+        """Return an upper bound on the length of the paths starting at cell
+        index `idx` through `region`: a path alternates between the two
+        square colours, starting with the colour opposite to that of `idx`.
+        """
+        if self._light >> idx & 1:
+            other, same = region & ~self._light, region & self._light
+        else:
+            other, same = region & self._light, region & ~self._light
+        return min(2 * popcount(other), 2 * popcount(same) + 1)
+
+    def longest_path(self, idx, region, check_time=None, target=None):
+        """Return the number of moves of the longest knight path starting at
+        cell index `idx` through the open cells of `region`.
+
+        Parameters
+        ----------
+        idx : int
+            Cell index of the starting cell.
+
+        region : int
+            Bitmask of the open cells reachable from `idx`.
+
+        check_time : callable (optional)
+            Called without arguments before every node of the search, e.g.
+            to raise an exception when the time is up.
+
+        target : int (optional)
+            If given, the search stops as soon as a path of at least `target`
+            moves is found and returns its length.
+        """
+        if len(self._memo) > self.max_entries:
+            self.clear()
+        if target is None:
+            target = popcount(region) + 1
+        return self._longest(idx, region, target, check_time)
+
+    def _longest(self, idx, region, target, check_time):
+        if check_time is not None:
+            check_time()
+        self.nodes += 1
+
+        # the memo holds (length, exact), where inexact lengths are lower
+        # bounds found by a search stopped at its target
+        key = (idx, region)
+        entry = self._memo.get(key)
+        if entry is not None and (entry[1] or entry[0] >= target):
+            return entry[0]
+
+        masks = self._masks
+        children = []
+        moves = masks[idx] & region
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            dest = low.bit_length() - 1
+            rest = region & ~low
+            # Warnsdorff's rule: cells with fewer onward moves first
+            children.append((popcount(masks[dest] & rest), dest, rest))
+        children.sort()
+
+        length = 0
+        bound = self.bound(idx, region)
+        for _, dest, rest in children:
+            if length >= bound or length >= target:
+                break
+            length = max(length, 1 + self._longest(
+                dest, reachable(masks, rest, dest), target - 1, check_time))
+
+        self._memo[key] = (length, length < target or length >= bound)
+        return length
+
+    def successors(self, game):
+        """Return the legal moves of the active player together with the cell
+        index and region of the destination, largest regions first.
+        """
+        idx, region = self.regions(game)[0]
+        result = []
+        moves = self._masks[idx] & region
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            dest = low.bit_length() - 1
+            result.append((self._coords[dest], dest,
+                           reachable(self._masks, region & ~low, dest)))
+        result.sort(key=lambda s: popcount(s[2]), reverse=True)
+        return result
+
+    def path_lengths(self, game, check_time=None):
+        """Return the longest path lengths of the active and of the inactive
+        player. In a partitioned position the active player wins iff the
+        first is strictly greater than the second.
+        """
+        return tuple(self.longest_path(idx, region, check_time)
+                     for idx, region in self.regions(game))
+
+    def search_moves(self, game, check_time=None):
+        """Generate (move, length) pairs for the active player of a
+        partitioned position, each one better than the previous one.
+
+        The search only looks for a path longer than the longest path of the
+        opponent, so `length` is the length of a winning path starting with
+        `move` if one exists and of the longest path otherwise.
+        """
+        (idx, region), (opp_idx, opp_region) = self.regions(game)
+        own_bound = self.bound(idx, region)
+        opp_length = self.longest_path(opp_idx, opp_region, check_time, own_bound)
+        target = opp_length + 1 if opp_length < own_bound else None
+
+        best_length = 0
+        for move, dest, dest_region in self.successors(game):
+            length = 1 + self.longest_path(
+                dest, dest_region, check_time, target and target - 1)
+            if length > best_length:
+                best_length = length
+                yield move, length
+                if target is not None and length >= target:
+                    return
+
+    def best_move(self, game, check_time=None):
+        """Return the last pair generated by `search_moves`, or
+        ((-1, -1), 0) if the active player has no legal moves.
+        """
+        best = (-1, -1), 0
+        for best in self.search_moves(game, check_time):
+            pass
+        return best
@@ -8,11 +8,69 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 import random
-import timeit
 from copy import copy
 
+from .clocks import wall_clock
+
 TIME_LIMIT_MILLIS = 150
 
+KNIGHT_DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                     (1, -2), (1, 2), (2, -1), (2, 1)]
+
+_TABLES = {}
+
+
+def move_tables(width, height):
+    """Return the precomputed move tables for a board of the given size.
+
+    Returns
+    -------
+    (list<(int, int)>, list<list<int>>, list<int>)
+        The (row, column) coordinates of every cell index, the list of cell
+        indices reachable by a knight move from every cell index, and the
+        same destinations packed as one bitmask per cell index.
+    """
+    key = (width, height)
+    if key not in _TABLES:
+        coords = [(idx % height, idx // height) for idx in range(width * height)]
+        moves = []
+        masks = []
+        for r, c in coords:
+            dests = [(r + dr) + (c + dc) * height for dr, dc in KNIGHT_DIRECTIONS
+                     if 0 <= r + dr < height and 0 <= c + dc < width]
+            moves.append(dests)
+            mask = 0
+            for d in dests:
+                mask |= 1 << d
+            masks.append(mask)
+        _TABLES[key] = (coords, moves, masks)
+    return _TABLES[key]
+
+
+_ZOBRIST_KEYS = {}
+
+
+def zobrist_keys(size):
+    """Return the random keys used to hash a board with `size` cells.
+
+    The keys are drawn from a fixed seed so that equal positions hash to the
+    same value in every process.
+
+    Returns
+    -------
+    (list<int>, (list<int>, list<int>), int)
+        One key per blocked cell, one key per cell for the location of each
+        player (player 1 first), and the key toggled whenever the player
+        holding initiative changes.
+    """
+    if size not in _ZOBRIST_KEYS:
+        rng = random.Random(size)
+        blocked = [rng.getrandbits(64) for _ in range(size)]
+        locations = ([rng.getrandbits(64) for _ in range(size)],
+                     [rng.getrandbits(64) for _ in range(size)])
+        _ZOBRIST_KEYS[size] = (blocked, locations, rng.getrandbits(64))
+    return _ZOBRIST_KEYS[size]
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -52,8 +110,36 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # undo stack for push_move()/pop_move()
+        self._undo = []
+
+        # Zobrist hash of the board state, updated incrementally by apply_move;
+        # _hash_state is the state list it was kept for, so that a state list
+        # assigned directly to _board_state gets its key recomputed
+        self._zobrist = zobrist_keys(width * height)
+        self._hash = 0
+        self._hash_state = self._board_state
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        if self._board_state is not self._hash_state:
+            self._sync_hash()
+        return self._hash
+
+    def _sync_hash(self):
+        """Recompute the Zobrist hash from scratch from `_board_state`."""
+        blocked, locations, side = self._zobrist
+        state = self._board_state
+        key = 0
+        for idx in range(self.width * self.height):
+            if state[idx] != Board.BLANK:
+                key ^= blocked[idx]
+        for loc_keys, loc in zip(locations, (state[-1], state[-2])):
+            if loc != Board.NOT_MOVED:
+                key ^= loc_keys[loc]
+        if state[-3]:
+            key ^= side
+        self._hash = key
+        self._hash_state = state
 
     @property
     def active_player(self):
@@ -97,6 +183,8 @@ class Board(object):
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._hash = self.hash()
+        new_board._hash_state = new_board._board_state
         return new_board
 
     def forecast_move(self, move):
@@ -142,6 +230,16 @@ class Board(object):
         return [(i, j) for j in range(self.width) for i in range(self.height)
                 if self._board_state[i + j * self.height] == Board.BLANK]
 
+    def get_blocked_mask(self):
+        """Return the blocked cells as an integer bitmask, where bit
+        `row + column * height` is set iff the cell (row, column) is blocked.
+        """
+        mask = 0
+        for idx, cell in enumerate(self._board_state[:self.width * self.height]):
+            if cell != Board.BLANK:
+                mask |= 1 << idx
+        return mask
+
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
 
@@ -201,12 +299,43 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        if self._board_state is not self._hash_state:
+            self._sync_hash()
+        blocked, locations, side = self._zobrist
+        loc_keys = locations[last_move_idx - 1]
+        prev_idx = self._board_state[-last_move_idx]
+        if prev_idx != Board.NOT_MOVED:
+            self._hash ^= loc_keys[prev_idx]
+        self._hash ^= blocked[idx] ^ loc_keys[idx] ^ side
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def push_move(self, move):
+        """Apply a move in-place like `apply_move`, remembering enough of the
+        previous state that it can be undone with `pop_move`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._undo.append((self._board_state[-last_move_idx], self.hash()))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the most recent move applied with `push_move`."""
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._board_state[self._board_state[-last_move_idx]] = Board.BLANK
+        self._board_state[-last_move_idx], self._hash = self._undo.pop()
+        self._board_state[-3] ^= 1
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
         return player == self._inactive_player and not self.get_legal_moves(self._active_player)
@@ -254,11 +383,12 @@ class Board(object):
         if loc == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
+        # the move tables already hold the in-bounds destinations of every
+        # cell, in the same order as the knight directions
+        coords, moves, _ = move_tables(self.width, self.height)
+        state = self._board_state
+        valid_moves = [coords[idx] for idx in moves[loc[0] + loc[1] * self.height]
+                       if state[idx] == Board.BLANK]
         random.shuffle(valid_moves)
         return valid_moves
 
@@ -299,7 +429,7 @@ class Board(object):
             out = 'Active player 2\n' + out
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, clock=wall_clock, move_times=None):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -309,6 +439,14 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        clock : callable (optional)
+            A function returning the current time in milliseconds, used to
+            time each turn (see `isolation.clocks`).
+
+        move_times : list (optional)
+            If given, the number of milliseconds taken by every call to
+            get_move() is appended to this list.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -318,7 +456,7 @@ class Board(object):
         """
         move_history = []
 
-        time_millis = lambda: 1000 * timeit.default_timer()
+        time_millis = clock
 
         while True:
 
@@ -329,6 +467,8 @@ class Board(object):
             time_left = lambda : time_limit - (time_millis() - move_start)
             curr_move = self._active_player.get_move(game_copy, time_left)
             move_end = time_left()
+            if move_times is not None:
+                move_times.append(time_limit - move_end)
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
@@ -345,8 +485,8 @@ class Board(object):
 
             self.apply_move(curr_move)
 
-    def play_next_move(self, time_limit=TIME_LIMIT_MILLIS):
-        time_millis = lambda: 1000 * timeit.default_timer()
+    def play_next_move(self, time_limit=TIME_LIMIT_MILLIS, clock=wall_clock):
+        time_millis = clock
 
         legal_player_moves = self.get_legal_moves()
         game_copy = self.copy()
@@ -0,0 +1,116 @@
+"""
+This file contains the `PlayoutBoard` class, a minimal game state used by
+Monte Carlo search to play out thousands of random games per second.
+
+A `PlayoutBoard` knows nothing about the player objects: it holds the blocked
+cells as an integer bitmask and the cell index of the player to move and of
+its opponent, indexed as in `Board._board_state` (`row + column * height`).
+"""
+import random
+
+from .isolation import Board, move_tables
+
+_BIT_LISTS = {}
+
+
+def bit_list(bits):
+    """Return the indices of the set bits of `bits` in increasing order.
+
+    Results are cached, since move generation only ever produces subsets of
+    the knight move masks.
+    """
+    cells = _BIT_LISTS.get(bits)
+    if cells is None:
+        cells = []
+        rest = bits
+        while rest:
+            low = rest & -rest
+            cells.append(low.bit_length() - 1)
+            rest ^= low
+        if len(_BIT_LISTS) < 1 << 16:
+            _BIT_LISTS[bits] = cells
+    return cells
+
+
+class PlayoutBoard:
+    """Game state of isolation from the point of view of the player to move.
+
+    Parameters
+    ----------
+    width : int (optional)
+        The number of columns of the board.
+
+    height : int (optional)
+        The number of rows of the board.
+    """
+
+    __slots__ = ("width", "height", "occupied", "own", "opp", "_masks", "_full")
+
+    def __init__(self, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.occupied = 0
+        # cell index of the player to move and of its opponent, -1 until
+        # the player has moved
+        self.own = -1
+        self.opp = -1
+        self._masks = move_tables(width, height)[2]
+        self._full = (1 << (width * height)) - 1
+
+    @classmethod
+    def from_board(cls, game):
+        """Return the playout state of the active player in `game`."""
+        board = cls(game.width, game.height)
+        board.occupied = game.get_blocked_mask()
+        for attr, player in (("own", game.active_player), ("opp", game.inactive_player)):
+            loc = game.get_player_location(player)
+            if loc is not Board.NOT_MOVED:
+                setattr(board, attr, loc[0] + loc[1] * game.height)
+        return board
+
+    def copy(self):
+        """Return a copy of the current state."""
+        board = PlayoutBoard.__new__(PlayoutBoard)
+        board.width, board.height = self.width, self.height
+        board.occupied, board.own, board.opp = self.occupied, self.own, self.opp
+        board._masks, board._full = self._masks, self._full
+        return board
+
+    def legal_moves(self):
+        """Return the cell indices the player to move can move to."""
+        if self.own < 0:
+            return bit_list(self._full & ~self.occupied)
+        return bit_list(self._masks[self.own] & ~self.occupied)
+
+    def apply(self, idx):
+        """Move the player to move to cell index `idx` and pass the turn."""
+        self.occupied |= 1 << idx
+        self.own, self.opp = self.opp, idx
+
+    def to_move(self, idx):
+        """Return the (row, column) coordinates of cell index `idx`."""
+        return idx % self.height, idx // self.height
+
+    def playout(self, rng=random):
+        """Play uniformly random moves until a player cannot move, modifying
+        the state in place, and return True if the player to move at the
+        start of the playout wins.
+        """
+        masks = self._masks
+        occupied, own, opp = self.occupied, self.own, self.opp
+        # whether the player to move is the one who moved first
+        first_to_move = True
+        while True:
+            if own < 0:
+                cells = bit_list(self._full & ~occupied)
+            else:
+                cells = bit_list(masks[own] & ~occupied)
+            if not cells:
+                break
+            dest = cells[int(rng.random() * len(cells))]
+            occupied |= 1 << dest
+            own, opp = opp, dest
+            first_to_move = not first_to_move
+        self.occupied, self.own, self.opp = occupied, own, opp
+        # the player to move has lost
+        return not first_to_move
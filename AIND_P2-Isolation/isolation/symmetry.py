@@ -0,0 +1,122 @@
+"""
+This file contains the symmetries of the isolation board and a canonical
+hash of positions, equal for all the positions that are images of each
+other under a symmetry.
+
+Cells are indexed as in `Board._board_state` (`row + column * height`) and a
+symmetry is a permutation of the cell indices. Knight moves are preserved by
+every reflection and rotation of the board, so two symmetric positions have
+the same game tree up to the permutation.
+"""
+
+_SYMMETRIES = {}
+_BYTE_TABLES = {}
+_PLAYER_TABLES = {}
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board of the given size as permutations of
+    the cell indices: the 8 symmetries of the square for square boards, and
+    the 4 reflections and rotations that keep the shape otherwise.
+    """
+    key = (width, height)
+    if key not in _SYMMETRIES:
+        transforms = [lambda r, c: (r, c),
+                      lambda r, c: (height - 1 - r, c),
+                      lambda r, c: (r, width - 1 - c),
+                      lambda r, c: (height - 1 - r, width - 1 - c)]
+        if width == height:
+            transforms += [lambda r, c: (c, r),
+                           lambda r, c: (width - 1 - c, r),
+                           lambda r, c: (c, height - 1 - r),
+                           lambda r, c: (width - 1 - c, height - 1 - r)]
+        perms = []
+        for transform in transforms:
+            perm = []
+            for idx in range(width * height):
+                r, c = transform(idx % height, idx // height)
+                perm.append(r + c * height)
+            perms.append(perm)
+        _SYMMETRIES[key] = perms
+    return _SYMMETRIES[key]
+
+
+def byte_tables(width, height):
+    """Return, for every symmetry, one table per byte of a blocked cell mask
+    mapping the 256 values of the byte to the image of its cells, so that a
+    mask is permuted with one lookup per byte instead of one per cell.
+    """
+    key = (width, height)
+    if key not in _BYTE_TABLES:
+        size = width * height
+        tables = []
+        for perm in symmetries(width, height):
+            per_byte = []
+            for start in range(0, size, 8):
+                table = [0] * 256
+                for value in range(1, 256):
+                    low = value & -value
+                    idx = start + low.bit_length() - 1
+                    image = 1 << perm[idx] if idx < size else 0
+                    table[value] = table[value ^ low] | image
+                per_byte.append(table)
+            tables.append(per_byte)
+        _BYTE_TABLES[key] = tables
+    return _BYTE_TABLES[key]
+
+
+def _player_tables(width, height):
+    """Return, for every pair of player cells (own, opp) shifted by one so
+    that 0 stands for a player who has not moved, the smallest images of
+    the pair under the symmetries and the symmetries giving them.
+    """
+    key = (width, height)
+    if key not in _PLAYER_TABLES:
+        size = width * height
+        perms = symmetries(width, height)
+        table = []
+        for own in range(-1, size):
+            row = []
+            for opp in range(-1, size):
+                images = [(perm[own] + 1 if own >= 0 else 0, perm[opp] + 1 if opp >= 0 else 0)
+                          for perm in perms]
+                best = min(images)
+                row.append((best, [s for s, image in enumerate(images) if image == best]))
+            table.append(row)
+        _PLAYER_TABLES[key] = table
+    return _PLAYER_TABLES[key]
+
+
+def _cell(game, player):
+    loc = game.get_player_location(player)
+    return -1 if loc is None else loc[0] + loc[1] * game.height
+
+
+def canonical_hash(game, player):
+    """Return an integer identifying the position of `game` seen by
+    `player` up to the symmetries of the board: the blocked cells, the cells
+    of `player` and of its opponent, and whether `player` is to move.
+
+    The hash is the smallest image of the position under the symmetries,
+    ordered by the player cells first, encoded without loss so distinct
+    positions never share a hash. Usually a single symmetry maps the player
+    cells to their smallest image, and only its image of the blocked cells
+    is computed.
+    """
+    width, height = game.width, game.height
+    size = width * height
+    own = _cell(game, player)
+    opp = _cell(game, game.get_opponent(player))
+    (own_image, opp_image), candidates = _player_tables(width, height)[own + 1][opp + 1]
+    raw = game.get_blocked_mask().to_bytes((size + 7) // 8, "little")
+    all_tables = byte_tables(width, height)
+    best = None
+    for s in candidates:
+        mask = 0
+        for table, byte in zip(all_tables[s], raw):
+            mask |= table[byte]
+        if best is None or mask < best:
+            best = mask
+    bits = size.bit_length()
+    return (((own_image << bits | opp_image) << size | best) << 1 |
+            (player is game.active_player))
@@ -0,0 +1,228 @@
+"""Build and read an opening book for isolation.
+
+The book maps every position of the first few plies, up to the symmetries of
+the board, to the move chosen by a long iterative deepening alpha-beta search
+from that position. It is stored as a small json file (`data.json` is the
+optional data file of the PvP competition) holding one entry per canonical
+position:
+
+    {"width": 7, "height": 7, "plies": 3,
+     "moves": {"<blocked cells in hex>.<p1 cell>.<p2 cell>": <cell>, ...}}
+
+where cells are indices `row + column * height` as in `Board._board_state`,
+a player who has not moved yet has cell -1, and keys and moves are written
+in the frame of the canonical symmetry (the one giving the smallest key).
+
+Build a book with e.g.
+
+    python opening_book.py --plies 3 --time 5000 --check-time 2500 --workers 4 --output data.json
+
+`--check-time` searches every position a second time with a shorter limit and
+leaves out the positions where the two searches disagree, so that the stored
+moves do not hinge on the speed of the machine building the book.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from isolation import BitBoard, wall_clock, symmetries
+from game_agent import AlphaBetaPlayer, custom_score, batch_custom_score
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.json")
+
+
+def _cell(game, player):
+    """Return the cell index of a player, or -1 if it has not moved."""
+    loc = game.get_player_location(player)
+    return -1 if loc is None else loc[0] + loc[1] * game.height
+
+
+def canonical_key(game):
+    """Return the canonical key of a position and the permutation mapping
+    cells of the position to cells of the canonical frame.
+    """
+    blocked = game.get_blocked_mask()
+    cells = []
+    while blocked:
+        low = blocked & -blocked
+        cells.append(low.bit_length() - 1)
+        blocked ^= low
+    p1, p2 = _cell(game, game._player_1), _cell(game, game._player_2)
+
+    best = None
+    for perm in symmetries(game.width, game.height):
+        mask = 0
+        for idx in cells:
+            mask |= 1 << perm[idx]
+        key = (mask, perm[p1] if p1 >= 0 else -1, perm[p2] if p2 >= 0 else -1)
+        if best is None or key < best[0]:
+            best = key, perm
+    key, perm = best
+    return "{:x}.{}.{}".format(*key), perm
+
+
+class OpeningBook:
+    """Opening book read lazily from a json file written by `build_book`.
+
+    Parameters
+    ----------
+    path : str (optional)
+        Path of the book file. A missing file gives an empty book.
+    """
+
+    def __init__(self, path=BOOK_PATH):
+        self.path = path
+        self.width = self.height = None
+        self.plies = 0
+        self.moves = None
+
+    def load(self):
+        """Read the book file unless it has already been read."""
+        if self.moves is not None:
+            return
+        self.moves = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        self.width, self.height = data["width"], data["height"]
+        self.plies = data["plies"]
+        self.moves = data["moves"]
+
+    def lookup(self, game):
+        """Return the book move of the active player in `game`, or None if
+        the position is not in the book.
+        """
+        self.load()
+        if (game.move_count >= self.plies or
+                (game.width, game.height) != (self.width, self.height)):
+            return None
+        key, perm = canonical_key(game)
+        cell = self.moves.get(key)
+        if cell is None:
+            return None
+        idx = perm.index(cell)
+        return idx % game.height, idx // game.height
+
+    def __len__(self):
+        self.load()
+        return len(self.moves)
+
+
+def book_positions(plies, width=7, height=7):
+    """Return one move sequence (as cell indices) leading to every canonical
+    position with fewer than `plies` moves played.
+    """
+    player_1, player_2 = object(), object()
+    positions = {}
+    layer = [[]]
+    for _ in range(plies):
+        next_layer = []
+        for history in layer:
+            game = BitBoard(player_1, player_2, width, height)
+            for idx in history:
+                game.apply_move((idx % height, idx // height))
+            key, _ = canonical_key(game)
+            if key in positions:
+                continue
+            positions[key] = history
+            for r, c in game.get_legal_moves():
+                next_layer.append(history + [r + c * height])
+        layer = next_layer
+    return positions
+
+
+def search_position(job):
+    """Return the key of a position and the cell chosen by a search of
+    `time_limit` milliseconds, as an entry of the book.
+    """
+    key, history, width, height, time_limit = job
+    players = [AlphaBetaPlayer(score_fn=custom_score, inplace=True, tt_size=1 << 16,
+                               move_ordering=True, batch_score_fn=batch_custom_score)
+               for _ in range(2)]
+    game = BitBoard(players[0], players[1], width, height)
+    for idx in history:
+        game.apply_move((idx % height, idx // height))
+    player = game.active_player
+    start = wall_clock()
+    move = player.get_move(game, lambda: time_limit - (wall_clock() - start))
+    perm = canonical_key(game)[1]
+    depth = player.depth_report[-1]["depth"] if player.depth_report else 0
+    return key, perm[move[0] + move[1] * height], depth
+
+
+def build_book(plies=3, time_limit=5000, width=7, height=7, workers=1, verbose=True,
+               check_time=None):
+    """Search every canonical position with fewer than `plies` moves played
+    and return the book as a dictionary in the on-disk format.
+
+    The move found in a given time depends on how fast the machine is, so
+    when `check_time` is given every position is searched a second time for
+    `check_time` milliseconds and only the positions where both searches
+    choose the same cell are stored.
+    """
+    positions = book_positions(plies, width, height)
+    ordered = sorted(positions.items(), key=lambda p: len(p[1]))
+    jobs = [(key, history, width, height, time_limit) for key, history in ordered]
+    if check_time is not None:
+        jobs += [(key, history, width, height, check_time) for key, history in ordered]
+    if verbose:
+        print("Searching {} positions for {} ms each".format(len(ordered), time_limit)
+              + (" and {} ms each".format(check_time) if check_time is not None else ""))
+
+    moves = {}
+    unstable = set()
+    if workers > 1:
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        results = pool.imap_unordered(search_position, jobs)
+    else:
+        pool = None
+        results = map(search_position, jobs)
+    try:
+        for key, cell, depth in results:
+            if key in moves and moves[key] != cell:
+                unstable.add(key)
+            moves[key] = cell
+            if verbose:
+                print("  {:<20} -> {:>2} (depth {})".format(key, cell, depth))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    for key in unstable:
+        del moves[key]
+    if verbose and unstable:
+        print("Dropped {} positions whose move depends on the time limit".format(len(unstable)))
+    return {"width": width, "height": height, "plies": plies, "moves": moves}
+
+
+def save_book(book, path=BOOK_PATH):
+    """Write a book in the compact on-disk format."""
+    with open(path, "w") as f:
+        json.dump(book, f, sort_keys=True, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book for isolation.")
+    parser.add_argument('--plies', type=int, default=3,
+                        help="Store a move for every position with fewer plies played.")
+    parser.add_argument('--time', type=int, default=5000,
+                        help="Search time per position in milliseconds.")
+    parser.add_argument('--width', type=int, default=7)
+    parser.add_argument('--height', type=int, default=7)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes searching positions in parallel.")
+    parser.add_argument('--check-time', type=int, default=None,
+                        help="Also search every position for this many milliseconds and "
+                             "only keep the moves both searches agree on.")
+    parser.add_argument('--output', default=BOOK_PATH)
+    args = parser.parse_args()
+
+    ts = time.time()
+    book = build_book(args.plies, args.time, args.width, args.height, args.workers,
+                      check_time=args.check_time)
+    save_book(book, args.output)
+    print("Wrote {} positions to {} in {:.2f}s".format(len(book["moves"]), args.output,
+                                                        time.time() - ts))
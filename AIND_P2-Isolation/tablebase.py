@@ -0,0 +1,230 @@
+"""Build and probe retrograde endgame tablebases for small isolation boards.
+
+A tablebase stores, for every position with at most `max_empty` open cells
+in which both players have moved, whether the player to move wins and in
+how many plies the game ends with best play (the winner ending it as soon
+as possible and the loser as late as possible).
+
+Positions are solved by increasing number of open cells: with no open cell
+the player to move has lost, and a position with k open cells is won iff
+one of its moves leads to a lost position with k - 1 open cells. Every level
+is computed at once with numpy over all sets of open cells and all pairs of
+player cells, so a 5x5 board up to 5 open cells takes a few seconds.
+
+The file holds a header packed as `HEADER` (magic, width, height,
+max_empty, bits per entry) followed by the bit-packed entries
+
+    win << distance_bits | distance
+
+ordered by number of open cells k, then by the colexicographic rank of the
+set of open cells among the k-subsets of the cells, then by the cell of the
+player to move and the cell of its opponent (cells are indexed `row +
+column * height` as in `Board._board_state`). Entries of impossible
+positions, e.g. a player on an open cell, are unused. `Tablebase` reads the
+file through a read-only memory map, so a probe costs a few microseconds
+and opening a large table reads nothing up front.
+
+    python tablebase.py --width 5 --height 5 --max-empty 5 --output tb_5x5.bin
+"""
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from isolation import move_tables
+
+HEADER = struct.Struct("<4sBBBB")
+MAGIC = b"ISTB"
+
+_BINOMIALS = {}
+
+
+def binomials(n):
+    """Return the table of binomial coefficients C(i, j) for 0 <= i, j <= n."""
+    if n not in _BINOMIALS:
+        table = np.zeros((n + 1, n + 1), dtype=np.int64)
+        for i in range(n + 1):
+            table[i, 0] = 1
+            for j in range(1, i + 1):
+                table[i, j] = table[i - 1, j - 1] + table[i - 1, j]
+        _BINOMIALS[n] = table
+    return _BINOMIALS[n]
+
+
+def _layout(size, max_empty):
+    """Return the bits per entry and the number of distance bits."""
+    distance_bits = max(max_empty.bit_length(), 1)
+    bits = 1 + distance_bits
+    for packed in (1, 2, 4, 8):
+        if bits <= packed:
+            return packed, distance_bits
+    raise ValueError("max_empty {} is too large".format(max_empty))
+
+
+def solve_levels(width, height, max_empty):
+    """Solve every position with at most `max_empty` open cells.
+
+    Returns
+    -------
+    list<(numpy.ndarray, numpy.ndarray)>
+        For every number of open cells k, the boolean win flags and the
+        distances of the positions, both of shape (C(size, k), size, size)
+        and indexed by the rank of the set of open cells, the cell of the
+        player to move and the cell of its opponent.
+    """
+    size = width * height
+    binom = binomials(size)
+    _, moves, _ = move_tables(width, height)
+    adj = np.zeros((size, size), dtype=bool)
+    for idx, dests in enumerate(moves):
+        adj[idx, dests] = True
+
+    # no open cell: the player to move has lost
+    levels = [(np.zeros((1, size, size), dtype=bool), np.zeros((1, size, size), dtype=np.uint8))]
+    for k in range(1, max_empty + 1):
+        combos = np.array(list(itertools.combinations(range(size), k)), dtype=np.int64)
+        ranks = binom[combos, np.arange(1, k + 1)].sum(axis=1)
+        prev_win, prev_dist = levels[-1]
+        count = len(combos)
+        win = np.zeros((count, size, size), dtype=bool)
+        win_dist = np.full((count, size, size), 255, dtype=np.uint8)
+        loss_dist = np.zeros((count, size, size), dtype=np.uint8)
+        for j in range(k):
+            # moving to the j-th open cell m leaves the other open cells,
+            # with the opponent to move and the mover on m
+            m = combos[:, j]
+            rest = np.delete(combos, j, axis=1)
+            child = binom[rest, np.arange(1, k)].sum(axis=1) if k > 1 else np.zeros(count, np.int64)
+            # child values for every cell of the opponent: (count, size)
+            child_win = prev_win[child, :, m]
+            child_dist = prev_dist[child, :, m]
+            movable = adj[:, m].T[:, :, None]                   # (count, own, 1)
+            wins = movable & ~child_win[:, None, :]             # (count, own, opp)
+            win |= wins
+            np.minimum(win_dist, np.where(wins, child_dist[:, None, :], 255), out=win_dist)
+            # the loser plays the longest line; any move counts when all lose
+            np.maximum(loss_dist, np.where(movable, child_dist[:, None, :] + 1, 0),
+                       out=loss_dist)
+        dist = np.where(win, win_dist + 1, loss_dist).astype(np.uint8)
+        order = np.argsort(ranks)
+        levels.append((win[order], dist[order]))
+    return levels
+
+
+def build_tablebase(width, height, max_empty):
+    """Solve the positions with at most `max_empty` open cells and return
+    the tablebase file contents.
+    """
+    size = width * height
+    bits, distance_bits = _layout(size, max_empty)
+    levels = solve_levels(width, height, max_empty)
+    values = np.concatenate([(win.astype(np.uint8) << distance_bits | dist).ravel()
+                             for win, dist in levels])
+    per_byte = 8 // bits
+    values = np.concatenate([values, np.zeros(-len(values) % per_byte, np.uint8)])
+    packed = np.zeros(len(values) // per_byte, dtype=np.uint8)
+    for i in range(per_byte):
+        packed |= values[i::per_byte] << (i * bits)
+    return HEADER.pack(MAGIC, width, height, max_empty, bits) + packed.tobytes()
+
+
+def save_tablebase(data, path):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class Tablebase:
+    """Endgame tablebase read from a file written by `build_tablebase`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the tablebase file, memory-mapped read-only on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self.max_empty, self.bits = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("{} is not an isolation tablebase".format(path))
+        self.size = size = self.width * self.height
+        _, self._distance_bits = _layout(size, self.max_empty)
+        self._binom = binomials(size).tolist()
+        # index of the first entry of every number of open cells
+        self._offsets = [0]
+        for k in range(self.max_empty):
+            self._offsets.append(self._offsets[-1] + self._binom[size][k] * size * size)
+        self.probes = 0
+
+    def __deepcopy__(self, memo):
+        # the table is read-only, so copies of a player can share the map
+        return self
+
+    def covers(self, game):
+        """Test whether the position of `game` is in the tablebase."""
+        return ((game.width, game.height) == (self.width, self.height) and
+                game.move_count >= 2 and self.size - game.move_count <= self.max_empty)
+
+    def probe(self, game):
+        """Return (win, distance) for the player to move in `game`: whether
+        it wins, and the number of plies left with best play; or None if
+        the position is not in the tablebase.
+        """
+        if not self.covers(game):
+            return None
+        self.probes += 1
+        size, height = self.size, game.height
+        r, c = game.get_player_location(game.active_player)
+        own = r + c * height
+        r, c = game.get_player_location(game.inactive_player)
+        opp = r + c * height
+        empty = ((1 << size) - 1) & ~game.get_blocked_mask()
+        binom = self._binom
+        k = 0
+        rank = 0
+        while empty:
+            low = empty & -empty
+            k += 1
+            rank += binom[low.bit_length() - 1][k]
+            empty ^= low
+        idx = (self._offsets[k] + rank * size * size + own * size + opp) * self.bits
+        value = (self._mmap[HEADER.size + (idx >> 3)] >> (idx & 7)) & ((1 << self.bits) - 1)
+        return bool(value >> self._distance_bits), value & ((1 << self._distance_bits) - 1)
+
+    def best_move(self, game):
+        """Return the move of the player to move in a covered position that
+        wins fastest, or loses slowest, and the (win, distance) of the
+        position; the move is (-1, -1) if there is none.
+        """
+        result = self.probe(game)
+        best_move, best_key = (-1, -1), None
+        for move in game.get_legal_moves():
+            child_win, child_dist = self.probe(game.forecast_move(move))
+            key = (not child_win, child_dist if child_win else -child_dist)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an isolation endgame tablebase.")
+    parser.add_argument('--width', type=int, default=5)
+    parser.add_argument('--height', type=int, default=5)
+    parser.add_argument('--max-empty', type=int, default=5,
+                        help="Solve every position with at most this many open cells.")
+    parser.add_argument('--output', default=None,
+                        help="Output file, tb_WIDTHxHEIGHT_MAXEMPTY.bin by default.")
+    args = parser.parse_args()
+
+    output = args.output or "tb_{}x{}_{}.bin".format(args.width, args.height, args.max_empty)
+    ts = time.time()
+    data = build_tablebase(args.width, args.height, args.max_empty)
+    save_tablebase(data, output)
+    print("Wrote {} ({:,} bytes) in {:.2f}s".format(output, os.path.getsize(output),
+                                                    time.time() - ts))
@@ -11,19 +11,25 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import copy
+import functools
 import itertools
+import json
+import multiprocessing
 import random
 import warnings
-import pickle
 import sys
 import time
 from collections import namedtuple
 
-from isolation import Board
+from isolation import Board, BitBoard, wall_clock, cpu_clock, NodeBudgetClock
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score_adaptive, custom_score_comb,
                         custom_score_2, custom_score_3)
+from competition_agent import MCTSPlayer
+from gamelog import GameLog
 
 NUM_MATCHES = 50  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
@@ -39,45 +45,138 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+def play_pair(cpu_player, test_player, opening, seeds, board_cls=Board, clock=wall_clock):
+    """Play a "fair" match pair between two players: one game with the cpu
+    player moving first and one with the test player moving first.
+
+    Both games start from the same `opening` moves, and the global random
+    state is reseeded from `seeds` before each game. The players (and the
+    clock timing each turn) are copied so that state they keep between moves
+    never carries over from previously played games.
+
+    Returns
+    -------
+    list<(bool, str, dict)>
+        For each game, whether the cpu player won, the termination reason,
+        and a record of the game with all its moves (opening included), the
+        time of every turn, and the `SearchStats` of each player that has
+        them
+    """
+    results = []
+    for first, game_seed in zip((True, False), seeds):
+        cpu, test, game_clock = copy.deepcopy((cpu_player, test_player, clock))
+        game = board_cls(cpu, test) if first else board_cls(test, cpu)
+        for move in opening:
+            game.apply_move(move)
+        random.seed(game_seed)
+        move_times = []
+        winner, hist, termination = game.play(time_limit=TIME_LIMIT, clock=game_clock,
+                                              move_times=move_times)
+        record = {"cpu_first": first, "moves": len(hist),
+                  "history": [list(move) for move in opening] + hist,
+                  "move_times": move_times,
+                  "cpu_stats": _stats(cpu), "test_stats": _stats(test)}
+        results.append((winner is cpu, termination, record))
+    return results
+
+
+def _stats(player):
+    stats = getattr(player, "stats", None)
+    return stats.to_dict() if stats is not None else None
+
+
+_pool_players = None
+
+
+def _init_worker(players):
+    global _pool_players
+    _pool_players = players
+
+
+def _play_pair_job(job):
+    test_idx, opening, seeds, board_cls, clock = job
+    return play_pair(_pool_players[0], _pool_players[test_idx + 1], opening, seeds,
+                     board_cls, clock)
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, board_cls=Board,
+               seed=None, workers=1, clock=wall_clock, stats_file=None, game_log=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    `board_cls` selects the game implementation (`Board` or `BitBoard`),
+    possibly with its size bound by `functools.partial`.
+
+    The openings and the random state of every game are derived from `seed`,
+    so the match pairs can be played by a pool of `workers` processes and
+    give the same results as a serial run with the same seed (as long as the
+    agents themselves do not depend on wall-clock timing, e.g. when every
+    turn is timed by a `NodeBudgetClock`).
+
+    `clock` times each turn; use `cpu_clock` or a `NodeBudgetClock` so that
+    parallel matches do not eat into each other's time budget.
+
+    If `stats_file` is given, one json object per game is written to it with
+    the agents, the result and the search statistics of both players, and if
+    `game_log` (a `gamelog.GameLog`) is given every game is appended to it.
     """
     timeout_count = 0
     forfeit_count = 0
-    for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
+    jobs = []
+    for match_idx in range(num_matches):
+        rng = random.Random("{}:{}".format(seed, match_idx))
 
         # initialize all games with a random move and response
+        game = board_cls(1, 2)
+        opening = []
         for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
-
-        # play all games and tally the results
-        for game in games:
-            winner, hist, termination = game.play(time_limit=TIME_LIMIT)
+            move = rng.choice(game.get_legal_moves())
+            game.apply_move(move)
+            opening.append(move)
+
+        for test_idx in range(len(test_agents)):
+            seeds = (rng.getrandbits(32), rng.getrandbits(32))
+            jobs.append((test_idx, opening, seeds, board_cls, clock))
+
+    players = [cpu_agent.player] + [agent.player for agent in test_agents]
+    if workers > 1:
+        # workers are forked so that players holding lambdas need no pickling
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(players,)) as pool:
+            results = pool.map(_play_pair_job, jobs)
+    else:
+        _init_worker(players)
+        results = [_play_pair_job(job) for job in jobs]
+
+    # tally the results
+    board = board_cls(1, 2)
+    for job_idx, ((test_idx, opening, _, _, _), pair) in enumerate(zip(jobs, results)):
+        for cpu_won, termination, record in pair:
+            winner = cpu_agent.player if cpu_won else test_agents[test_idx].player
             win_counts[winner] += 1
 
+            if game_log is not None:
+                names = (cpu_agent.name, test_agents[test_idx].name)
+                if not record["cpu_first"]:
+                    names = names[::-1]
+                game_log.append(board.width, board.height, names, record["history"], len(opening),
+                                int(cpu_won != record["cpu_first"]), termination,
+                                record["move_times"])
+
+            if stats_file is not None:
+                record.update(cpu_agent=cpu_agent.name, test_agent=test_agents[test_idx].name,
+                              match=job_idx // len(test_agents), cpu_won=cpu_won,
+                              termination=termination)
+                stats_file.write(json.dumps(record, sort_keys=True) + "\n")
+
             if termination == "timeout":
                 timeout_count += 1
             elif termination == "forfeit":
                 forfeit_count += 1
-                # dbg_dict = {'hist'            : hist,
-                #             'board'           : game._board_state,
-                #             'player1'         : type(game._player_1),
-                #             'player2'         : type(game._player_2)}
-                # with open('dbg.pkl', 'wb') as f:
-                #     pickle.dump(dbg_dict, f)
-                #     print('Debug info is dumped to {}'.format('dbg.pkl'))
-                #
-                # sys.exit(0)
 
     return timeout_count, forfeit_count
 
@@ -88,7 +187,8 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
+def play_matches(cpu_agents, test_agents, num_matches, board_cls=Board, seed=None, workers=1,
+                 clock=wall_clock, stats_file=None, game_log=None):
     """Play matches between the test agent and each cpu_agent individually. """
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
@@ -104,7 +204,8 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^15}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, board_cls,
+                            "{}:{}".format(seed, idx), workers, clock, stats_file, game_log)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -189,11 +290,41 @@ def test_combined_adaptive():
 
     return test_agents
 
-def main():
+def test_mcts():
+    test_agents = [
+          Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
+        , Agent(MCTSPlayer(c=0.7), "MCTS_0.7")
+        , Agent(MCTSPlayer(c=1.4), "MCTS_1.4")
+        , Agent(MCTSPlayer(c=2.8), "MCTS_2.8")
+    ]
+
+    return test_agents
+
+TEST_AGENTS = {
+    "aggressive": test_aggresive,
+    "weighted": test_weighted_move,
+    "combined": test_combined_strategy,
+    "adaptive": test_combined_adaptive,
+    "mcts": test_mcts,
+}
+
+def calibrated_clock(board_cls=Board):
+    """Return a `NodeBudgetClock` giving AB_Improved the same number of
+    search nodes per turn as TIME_LIMIT milliseconds do on this machine.
+    """
+    player = AlphaBetaPlayer(score_fn=improved_score)
+    game = board_cls(player, RandomPlayer())
+    game.apply_move((2, 3))
+    game.apply_move((4, 3))
+    return NodeBudgetClock.calibrate(player, game, TIME_LIMIT)
+
+
+def main(board_cls=Board, seed=None, workers=1, clock_name="wall", agents="combined",
+         stats_path=None, log_path=None):
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
-    test_agents = test_combined_strategy()
+    test_agents = TEST_AGENTS[agents]()
 
     # Define a collection of agents to compete against the test agents
     cpu_agents = [
@@ -210,11 +341,57 @@ def main():
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if clock_name == "nodes":
+        clock = calibrated_clock(board_cls)
+        clock_name = "nodes, {:.4f} ms per node".format(clock.ms_per_call)
+    else:
+        clock = cpu_clock if clock_name == "cpu" else wall_clock
+    print("{:^74}".format("(seed {}, {} worker(s), {} clock)".format(seed, workers, clock_name)))
+    game_log = GameLog(log_path) if log_path is not None else None
+    if stats_path is None:
+        play_matches(cpu_agents, test_agents, NUM_MATCHES, board_cls, seed, workers, clock,
+                     game_log=game_log)
+    else:
+        with open(stats_path, "w") as stats_file:
+            play_matches(cpu_agents, test_agents, NUM_MATCHES, board_cls, seed, workers, clock,
+                         stats_file, game_log)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a round-robin tournament of isolation agents.")
+    parser.add_argument('--bitboard', action="store_true",
+                        help="Play the matches on isolation.BitBoard instead of isolation.Board.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes playing match pairs in parallel.")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed of the openings and random players; a run with the same seed " +
+                             "gives the same results whatever the number of workers.")
+    parser.add_argument('--clock', choices=["wall", "cpu", "nodes"], default="wall",
+                        help="Time each turn by wall-clock time, by the CPU time of the player, " +
+                             "or by a deterministic budget of search nodes calibrated to " +
+                             "TIME_LIMIT on this machine.")
+    parser.add_argument('--agents', choices=sorted(TEST_AGENTS), default="combined",
+                        help="Set of test agents to evaluate; \"mcts\" compares Monte Carlo " +
+                             "tree search players to AB_Improved.")
+    parser.add_argument('--size', default="7", metavar="WIDTHxHEIGHT",
+                        help="Size of the board, e.g. 9 or 11x9.")
+    parser.add_argument('--time-limit', type=int, default=TIME_LIMIT,
+                        help="Number of milliseconds per turn.")
+    parser.add_argument('--stats', default=None, metavar="FILE",
+                        help="Write the search statistics of both players of every game " +
+                             "to FILE, one json object per line.")
+    parser.add_argument('--log', default=None, metavar="FILE",
+                        help="Append every game to the binary game log FILE (see gamelog.py).")
+    args = parser.parse_args()
+    TIME_LIMIT = args.time_limit
+    width, _, height = args.size.partition("x")
+    board_cls = functools.partial(BitBoard if args.bitboard else Board,
+                                  width=int(width), height=int(height or width))
+
     ts = time.time()
-    main()
+    main(board_cls, args.seed, args.workers, args.clock, args.agents,
+         args.stats, args.log)
     te = time.time()
     print('Your total run-time {:.2f}'.format(te - ts))
@@ -0,0 +1,216 @@
+"""Tune the weights of the isolation heuristics by self-play.
+
+The tuner runs simultaneous perturbation stochastic approximation (SPSA):
+at every iteration all the weights of a heuristic are perturbed at once by
++/- c_k in a random direction, a batch of "fair" match pairs is played
+between an alpha-beta agent using the weights moved in that direction and
+one using the weights moved the other way, and the weights take a step of
+a_k along the direction in proportion to the score of the match. The gains
+decay as
+
+    a_k = a / (k + 1 + A) ** 0.602,    c_k = c / (k + 1) ** 0.101
+
+Games are played by a pool of processes with every turn timed by a
+`NodeBudgetClock`, so the games, and hence the whole run for a given seed,
+do not depend on the speed or load of the machine. The state of the run is
+written to a json checkpoint after every iteration, and a run started with
+the same checkpoint resumes where it stopped and follows the same path as
+an uninterrupted run (the settings of a resumed run are those saved in the
+checkpoint):
+
+    python tune.py combined --iterations 200 --pairs 8 --workers 4 \\
+        --checkpoint tune_combined.json
+
+The tunable heuristics are the families compared by the `--agents` option
+of `tournament.py`, each with the keyword arguments of its score function
+that are tuned.
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+
+import tournament
+from isolation import Board, NodeBudgetClock
+from game_agent import (AlphaBetaPlayer, custom_score_2, custom_score_3, custom_score_comb,
+                        custom_score_adaptive)
+
+Family = namedtuple("Family", ["score_fn", "params", "start", "bounds", "c"])
+Family.__doc__ = """A tunable heuristic: the score function, the names of its
+keyword arguments that are tuned, their hand-picked values, their (low,
+high) bounds and the size of the perturbations c.
+"""
+
+FAMILIES = {
+    "aggressive": Family(custom_score_2, ["weight"], [1.5], [(0., 4.)], 0.3),
+    "weighted": Family(custom_score_3, ["weight"], [1.0], [(0., 4.)], 0.3),
+    "combined": Family(custom_score_comb, ["alpha"], [2.0], [(0., 5.)], 0.3),
+    "adaptive": Family(custom_score_adaptive, ["weight"], [1.0], [(0., 4.)], 0.3),
+}
+
+
+def score_function(family, theta):
+    """Return the score function of `family` with the weights `theta`."""
+    fam = FAMILIES[family]
+    return functools.partial(fam.score_fn, **dict(zip(fam.params, theta)))
+
+
+def _play_job(job):
+    """Play a match pair between the weights theta_plus and theta_minus
+    and return the score of theta_plus (+1 per win, -1 per loss).
+    """
+    family, theta_plus, theta_minus, opening, seeds, nodes = job
+    plus = AlphaBetaPlayer(score_fn=score_function(family, theta_plus))
+    minus = AlphaBetaPlayer(score_fn=score_function(family, theta_minus))
+    clock = NodeBudgetClock(float(tournament.TIME_LIMIT) / nodes)
+    results = tournament.play_pair(plus, minus, opening, seeds, Board, clock)
+    return sum(1 if plus_won else -1 for plus_won, _, _ in results)
+
+
+def _openings(rng, num_pairs):
+    """Return a random move and response for every match pair."""
+    openings = []
+    for _ in range(num_pairs):
+        game = Board(1, 2)
+        opening = []
+        for _ in range(2):
+            move = rng.choice(game.get_legal_moves())
+            game.apply_move(move)
+            opening.append(move)
+        openings.append(opening)
+    return openings
+
+
+def play_match(family, theta_plus, theta_minus, rng, pairs, nodes, pool=None):
+    """Play `pairs` match pairs and return the mean score of theta_plus,
+    between -1 (lost every game) and 1 (won every game).
+    """
+    jobs = [(family, theta_plus, theta_minus, opening,
+             (rng.getrandbits(32), rng.getrandbits(32)), nodes)
+            for opening in _openings(rng, pairs)]
+    scores = pool.map(_play_job, jobs) if pool is not None else list(map(_play_job, jobs))
+    return sum(scores) / (2. * pairs)
+
+
+def new_state(family, seed=0, a=None, A=None, pairs=8, nodes=2000):
+    """Return the initial state of a tuning run, in the checkpoint format."""
+    fam = FAMILIES[family]
+    return {
+        "family": family,
+        "params": fam.params,
+        "theta": list(fam.start),
+        "iteration": 0,
+        "seed": seed,
+        # a step of about c for a match won or lost by the whole batch
+        "a": a if a is not None else 2 * fam.c,
+        "c": fam.c,
+        "A": A if A is not None else 10,
+        "pairs": pairs,
+        "nodes": nodes,
+        "history": [],
+    }
+
+
+def spsa_step(state, pool=None):
+    """Run one SPSA iteration, updating `state` in place."""
+    fam = FAMILIES[state["family"]]
+    k = state["iteration"]
+    # all the randomness of iteration k comes from the seed and k, so a
+    # resumed run plays the same games as an uninterrupted one
+    rng = random.Random("{}:{}".format(state["seed"], k))
+    a_k = state["a"] / (k + 1 + state["A"]) ** 0.602
+    c_k = state["c"] / (k + 1) ** 0.101
+    theta = state["theta"]
+    delta = [rng.choice((-1, 1)) for _ in theta]
+    theta_plus = [t + c_k * d for t, d in zip(theta, delta)]
+    theta_minus = [t - c_k * d for t, d in zip(theta, delta)]
+
+    result = play_match(state["family"], theta_plus, theta_minus, rng,
+                        state["pairs"], state["nodes"], pool)
+
+    # gradient estimate result / (2 c_k delta_i), with 1 / delta_i = delta_i
+    state["theta"] = [min(max(t + a_k * result * d / (2 * c_k), low), high)
+                      for t, d, (low, high) in zip(theta, delta, fam.bounds)]
+    state["iteration"] = k + 1
+    state["history"].append({"iteration": k, "theta": theta, "delta": delta,
+                             "result": result})
+
+
+def save_checkpoint(state, path):
+    """Write the state of a run, replacing the previous checkpoint only once
+    the new one is completely written.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def tune(state, iterations, workers=1, checkpoint=None, verbose=True):
+    """Run SPSA iterations until `state` has completed `iterations`, writing
+    `checkpoint` after each one, and return the state.
+    """
+    if workers > 1:
+        pool = multiprocessing.get_context("fork").Pool(workers)
+    else:
+        pool = None
+    try:
+        while state["iteration"] < iterations:
+            start = time.time()
+            spsa_step(state, pool)
+            if checkpoint is not None:
+                save_checkpoint(state, checkpoint)
+            if verbose:
+                last = state["history"][-1]
+                print("{:>5}  result {:+.3f}  theta {}  ({:.1f}s)".format(
+                    last["iteration"], last["result"],
+                    " ".join("{}={:.3f}".format(p, t)
+                             for p, t in zip(state["params"], state["theta"])),
+                    time.time() - start))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune heuristic weights by SPSA self-play.")
+    parser.add_argument('family', choices=sorted(FAMILIES),
+                        help="The heuristic to tune, as in tournament.py --agents.")
+    parser.add_argument('--iterations', type=int, default=100,
+                        help="Total number of SPSA iterations, including resumed ones.")
+    parser.add_argument('--pairs', type=int, default=8,
+                        help="Number of match pairs played at every iteration.")
+    parser.add_argument('--nodes', type=int, default=2000,
+                        help="Search nodes per turn (the budget of the node clock).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes playing match pairs in parallel.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default=None, metavar="FILE",
+                        help="Save the run to FILE after every iteration, and resume the " +
+                             "run saved in FILE if it exists.")
+    args = parser.parse_args()
+
+    if args.checkpoint is not None and os.path.exists(args.checkpoint):
+        state = load_checkpoint(args.checkpoint)
+        if state["family"] != args.family:
+            parser.error("{} holds a run of {}".format(args.checkpoint, state["family"]))
+        print("Resuming {} at iteration {}".format(args.checkpoint, state["iteration"]))
+    else:
+        state = new_state(args.family, args.seed, pairs=args.pairs, nodes=args.nodes)
+
+    ts = time.time()
+    tune(state, args.iterations, args.workers, args.checkpoint)
+    print("Tuned {} in {:.1f}s: {}".format(
+        args.family, time.time() - ts,
+        ", ".join("{}={:.3f}".format(p, t) for p, t in zip(state["params"], state["theta"]))))
@@ -549,20 +549,27 @@ def Stack():
 
 class FIFOQueue(Queue):
 
-    """A First-In-First-Out Queue."""
+    """A First-In-First-Out Queue.
+
+    MODIFIED FROM AIMA VERSION
+        - Use an additional dict to track membership
+    """
 
     def __init__(self):
         self.A = []
+        self._A = defaultdict(lambda: 0)
         self.start = 0
 
     def append(self, item):
         self.A.append(item)
+        self._A[item] += 1
 
     def __len__(self):
         return len(self.A) - self.start
 
     def extend(self, items):
-        self.A.extend(items)
+        for item in items:
+            self.append(item)
 
     def pop(self):
         e = self.A[self.start]
@@ -570,10 +577,11 @@ class FIFOQueue(Queue):
         if self.start > 5 and self.start > len(self.A) / 2:
             self.A = self.A[self.start:]
             self.start = 0
+        self._A[e] -= 1
         return e
 
     def __contains__(self, item):
-        return item in self.A[self.start:]
+        return self._A[item] > 0
 
 
 class PriorityQueue(Queue):
@@ -589,11 +597,14 @@ class PriorityQueue(Queue):
     def __init__(self, order=None, f=lambda x: x):
         self.A = []
         self._A = defaultdict(lambda: 0)
+        self._items = {}
         self.f = f
 
     def append(self, item):
         heapq.heappush(self.A, (self.f(item), item))
         self._A[item] += 1
+        # the last appended of equal items is the one returned by lookup
+        self._items[item] = item
 
     def __len__(self):
         return len(self.A)
@@ -601,6 +612,8 @@ class PriorityQueue(Queue):
     def pop(self):
         _, item = heapq.heappop(self.A)
         self._A[item] -= 1
+        if self._A[item] == 0:
+            del self._items[item]
         return item
 
     def __contains__(self, item):
@@ -608,7 +621,7 @@ class PriorityQueue(Queue):
 
     def __getitem__(self, key):
         if self._A[key] > 0:
-            return key
+            return self._items[key]
 
 # ______________________________________________________________________________
 # Useful Shorthands
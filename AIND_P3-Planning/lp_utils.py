@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from aimacode.logic import associate
 from aimacode.utils import expr
 
@@ -50,19 +52,102 @@ def encode_state(fs: FluentState, fluent_map: list) -> str:
     return "".join(state_tf)
 
 
-def decode_state(state: str, fluent_map: list) -> FluentState:
-    """ decode string of T/F as fluent per mapping
+def encode_state_bits(fs: FluentState, fluent_map: list) -> int:
+    """ encode fluents to an integer bitmask using mapping
 
-    :param state: str eg. "TFFTFT" string of mapped positive and negative fluents
+    :param fs: FluentState object
+    :param fluent_map: ordered list of possible fluents for the problem
+    :return: int with bit i set iff fluent_map[i] is a positive fluent
+        e.g. 0b101001 for the state "TFFTFT"
+    """
+    return fluent_mask(fs.pos, fluent_map)
+
+
+def fluent_mask(fluents: list, fluent_map: list) -> int:
+    """ bitmask of a list of fluents using mapping
+
+    :param fluents: list of fluents, each of them in fluent_map
+    :param fluent_map: ordered list of possible fluents for the problem
+    :return: int with bit i set iff fluent_map[i] is in fluents
+    """
+    mask = 0
+    for idx, fluent in enumerate(fluent_map):
+        if fluent in fluents:
+            mask |= 1 << idx
+    return mask
+
+
+def decode_state(state, fluent_map: list) -> FluentState:
+    """ decode string of T/F (or integer bitmask) as fluent per mapping
+
+    :param state: str eg. "TFFTFT" string of mapped positive and negative fluents,
+        or int bitmask as returned by encode_state_bits
     :param fluent_map: ordered list of possible fluents for the problem
     :return: fs: FluentState object
 
     lengths of state string and fluent_map list must be the same
     """
     fs = FluentState([], [])
+    if isinstance(state, int):
+        for idx, fluent in enumerate(fluent_map):
+            if state >> idx & 1:
+                fs.pos.append(fluent)
+            else:
+                fs.neg.append(fluent)
+        return fs
     for idx, char in enumerate(state):
         if char == 'T':
             fs.pos.append(fluent_map[idx])
         else:
             fs.neg.append(fluent_map[idx])
     return fs
+
+
+class HeuristicCache():
+    """ least recently used cache of heuristic values keyed by heuristic name
+    and encoded state, so that every path reaching a state shares its value
+
+    :param maxsize: int, the number of values kept (None for no limit, 0 to disable)
+    """
+
+    def __init__(self, maxsize=8192):
+        if maxsize is not None and (not isinstance(maxsize, int) or maxsize < 0):
+            raise ValueError("maxsize must be None or a non-negative int, not {!r}".format(maxsize))
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def lookup(self, name: str, state, compute):
+        """ return the value of heuristic `name` for state, calling
+        compute(state) on a miss
+
+        :param name: str name of the heuristic
+        :param state: encoded state (hashable)
+        :param compute: function of the state returning the heuristic value
+        :return: heuristic value
+        """
+        key = (name, state)
+        values = self._values
+        if key in values:
+            self.hits += 1
+            values.move_to_end(key)
+            return values[key]
+        self.misses += 1
+        value = compute(state)
+        if self.maxsize != 0:
+            values[key] = value
+            if self.maxsize is not None and len(values) > self.maxsize:
+                values.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def clear(self):
+        self._values.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._values)
@@ -1,19 +1,17 @@
-from aimacode.logic import PropKB
 from aimacode.planning import Action
 from aimacode.search import (
     Node, Problem,
 )
 from aimacode.utils import expr
 from lp_utils import (
-    FluentState, encode_state, decode_state,
+    FluentState, encode_state_bits, fluent_mask, HeuristicCache,
 )
-from my_planning_graph import PlanningGraph
-
-from functools import lru_cache
+from my_planning_graph import BitPlanningGraph
 
 
 class AirCargoProblem(Problem):
-    def __init__(self, cargos, planes, airports, initial: FluentState, goal: list):
+    def __init__(self, cargos, planes, airports, initial: FluentState, goal: list,
+                 cache_size=8192):
         """
 
         :param cargos: list of str
@@ -26,14 +24,27 @@ class AirCargoProblem(Problem):
             positive and negative literal fluents (as expr) describing initial state
         :param goal: list of expr
             literal fluents required for goal test
+        :param cache_size: int
+            number of heuristic values kept by `heuristic_cache` (None for no limit, 0 to disable)
+
+        States are integer bitmasks over `state_map` (bit i is set iff the
+        fluent state_map[i] holds), so that with the precondition, add and
+        delete masks of every action computed once here, testing an action
+        and applying it are a few integer operations. The actions are also
+        indexed by one of their positive preconditions (see `_index_actions`)
+        so that `actions` only tests those triggered by a fluent of the state.
         """
         self.state_map = initial.pos + initial.neg
-        self.initial_state_TF = encode_state(initial, self.state_map)
-        Problem.__init__(self, self.initial_state_TF, goal=goal)
+        self.initial_state_bits = encode_state_bits(initial, self.state_map)
+        Problem.__init__(self, self.initial_state_bits, goal=goal)
         self.cargos = cargos
         self.planes = planes
         self.airports = airports
         self.actions_list = self.get_actions()
+        self.goal_mask = fluent_mask(goal, self.state_map)
+        self._masks = {}
+        self._index_actions()
+        self.heuristic_cache = HeuristicCache(cache_size)
 
     def get_actions(self):
         """
@@ -123,39 +134,71 @@ class AirCargoProblem(Problem):
 
         return load_actions() + unload_actions() + fly_actions()
 
-    def actions(self, state: str) -> list:
+    def action_masks(self, action: Action):
+        """ Return the (precond_pos, precond_neg, effect_add, effect_rem)
+        bitmasks of an action, computed on its first use.
+
+        :param action: Action whose fluents are all in state_map
+        :return: tuple of 4 int
+        """
+        masks = self._masks.get(action)
+        if masks is None:
+            masks = (fluent_mask(action.precond_pos, self.state_map),
+                     fluent_mask(action.precond_neg, self.state_map),
+                     fluent_mask(action.effect_add, self.state_map),
+                     fluent_mask(action.effect_rem, self.state_map))
+            self._masks[action] = masks
+        return masks
+
+    def _index_actions(self):
+        """ Build the trigger lists of the actions, once per problem.
+
+        Every action with a positive precondition is stored in the trigger
+        list of the precondition fluent shared by the fewest actions, as
+        (index in actions_list, precond_pos mask, precond_neg mask, action);
+        the actions without positive preconditions are always tested.
+        """
+        masks = [self.action_masks(action) for action in self.actions_list]
+        counts = [0] * len(self.state_map)
+        for pre_pos, _, _, _ in masks:
+            for idx in range(len(self.state_map)):
+                counts[idx] += pre_pos >> idx & 1
+        self._triggers = [[] for _ in self.state_map]
+        self._untriggered = []
+        self._trigger_mask = 0
+        for order, ((pre_pos, pre_neg, _, _), action) in enumerate(zip(masks, self.actions_list)):
+            entry = (order, pre_pos, pre_neg, action)
+            if not pre_pos:
+                self._untriggered.append(entry)
+                continue
+            idx = min((i for i in range(len(self.state_map)) if pre_pos >> i & 1),
+                      key=lambda i: counts[i])
+            self._triggers[idx].append(entry)
+            self._trigger_mask |= 1 << idx
+
+    def actions(self, state: int) -> list:
         """ Return the actions that can be executed in the given state.
 
-        :param state: str
-            state represented as T/F string of mapped fluents (state variables)
-            e.g. 'FTTTFF'
+        :param state: int
+            state represented as bitmask of mapped fluents (state variables)
+            e.g. 0b0110 for 'FTTF'
         :return: list of Action objects
         """
-        # TODO implement
-        possible_actions = []
-
-        # build a propostional knowledge base
-        kb = PropKB()
-        kb.tell(decode_state(state, self.state_map).pos_sentence())
-
-        for action in self.actions_list:
-            is_possible = True
-            for clause in action.precond_pos:
-                if clause not in kb.clauses:
-                    is_possible = False
-                    break
-
-            for clause in action.precond_neg:
-                if clause in kb.clauses:
-                    is_possible = False
-                    break
-
-            if is_possible:
-                possible_actions.append(action)
-
-        return possible_actions
-
-    def result(self, state: str, action: Action):
+        found = [entry for entry in self._untriggered
+                 if state & entry[1] == entry[1] and not state & entry[2]]
+        triggers = self._triggers
+        fluents = state & self._trigger_mask
+        while fluents:
+            low = fluents & -fluents
+            for entry in triggers[low.bit_length() - 1]:
+                if state & entry[1] == entry[1] and not state & entry[2]:
+                    found.append(entry)
+            fluents ^= low
+        # in the order of actions_list, as a linear scan would return them
+        found.sort()
+        return [entry[3] for entry in found]
+
+    def result(self, state: int, action: Action):
         """ Return the state that results from executing the given
         action in the given state. The action must be one of
         self.actions(state).
@@ -164,77 +207,57 @@ class AirCargoProblem(Problem):
         :param action: Action applied
         :return: resulting state after action
         """
-        # TODO implement
-        new_state = FluentState([], [])
-        old_state = decode_state(state, self.state_map)
-        for fluent in old_state.pos:
-            if fluent not in action.effect_rem:
-                new_state.pos.append(fluent)
-        for fluent in action.effect_add:
-            if fluent not in new_state.pos:
-                new_state.pos.append(fluent)
-        for fluent in old_state.neg:
-            if fluent not in action.effect_add:
-                new_state.neg.append(fluent)
-        for fluent in action.effect_rem:
-            if fluent not in new_state.neg:
-                new_state.neg.append(fluent)
-
-        return encode_state(new_state, self.state_map)
-
-    def goal_test(self, state: str) -> bool:
+        _, _, add, rem = self.action_masks(action)
+        return (state & ~rem) | add
+
+    def goal_test(self, state: int) -> bool:
         """ Test the state to see if goal is reached
 
-        :param state: str representing state
+        :param state: int representing state
         :return: bool
         """
-        kb = PropKB()
-        kb.tell(decode_state(state, self.state_map).pos_sentence())
-        for clause in self.goal:
-            if clause not in kb.clauses:
-                return False
-        return True
+        return state & self.goal_mask == self.goal_mask
 
     def h_1(self, node: Node):
         # note that this is not a true heuristic
         h_const = 1
         return h_const
 
-    @lru_cache(maxsize=8192)
     def h_pg_levelsum(self, node: Node):
         """This heuristic uses a planning graph representation of the problem
         state space to estimate the sum of all actions that must be carried
         out from the current state in order to satisfy each individual goal
         condition.
         """
+        return self.heuristic_cache.lookup('h_pg_levelsum', node.state, self._pg_levelsum)
+
+    def _pg_levelsum(self, state: int):
         # requires implemented PlanningGraph class
-        pg = PlanningGraph(self, node.state)
+        pg = BitPlanningGraph(self, state)
         pg_levelsum = pg.h_levelsum()
         return pg_levelsum
 
-    @lru_cache(maxsize=8192)
     def h_ignore_preconditions(self, node: Node):
         """This heuristic estimates the minimum number of actions that must be
         carried out from the current state in order to satisfy all of the goal
         conditions by ignoring the preconditions required for an action to be
         executed.
         """
+        return self.heuristic_cache.lookup('h_ignore_preconditions', node.state,
+                                           self._ignore_preconditions)
+
+    def _ignore_preconditions(self, state: int):
         # TODO implement (see Russell-Norvig Ed-3 10.2.3  or Russell-Norvig Ed-2 11.2)
         count = 0
         # we implement a simple heuristic that count
         #   number of goal hasn't satisfied
         # here we assume for a goal to be satisfied, it requires at least one action
         # and no action achieves multiple goal
-        kb = PropKB()
-        kb.tell(decode_state(node.state, self.state_map).pos_sentence())
-        for clause in self.goal:
-            if clause not in kb.clauses:
-                count += 1
-
+        count = bin(self.goal_mask & ~state).count('1')
         return count
 
 
-def air_cargo_p1() -> AirCargoProblem:
+def air_cargo_p1(cache_size=8192) -> AirCargoProblem:
     cargos = ['C1', 'C2']
     planes = ['P1', 'P2']
     airports = ['JFK', 'SFO']
@@ -256,10 +279,10 @@ def air_cargo_p1() -> AirCargoProblem:
     goal = [expr('At(C1, JFK)'),
             expr('At(C2, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    return AirCargoProblem(cargos, planes, airports, init, goal, cache_size)
 
 
-def air_cargo_p2() -> AirCargoProblem:
+def air_cargo_p2(cache_size=8192) -> AirCargoProblem:
     # TODO implement Problem 2 definition
     cargos = ['C1', 'C2', 'C3']
     planes = ['P1', 'P2', 'P3']
@@ -280,10 +303,10 @@ def air_cargo_p2() -> AirCargoProblem:
             expr('At(C2, SFO)'),
             expr('At(C3, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    return AirCargoProblem(cargos, planes, airports, init, goal, cache_size)
 
 
-def air_cargo_p3() -> AirCargoProblem:
+def air_cargo_p3(cache_size=8192) -> AirCargoProblem:
     # TODO implement Problem 3 definition
     cargos = ['C1', 'C2', 'C3', 'C4']
     planes = ['P1', 'P2']
@@ -305,4 +328,4 @@ def air_cargo_p3() -> AirCargoProblem:
             expr('At(C3, JFK)'),
             expr('At(C4, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
\ No newline at end of file
+    return AirCargoProblem(cargos, planes, airports, init, goal, cache_size)
\ No newline at end of file
@@ -1,3 +1,7 @@
+import weakref
+
+import numpy as np
+
 from aimacode.planning import Action
 from aimacode.search import Problem
 from aimacode.utils import expr
@@ -211,6 +215,8 @@ class PlanningGraph():
         Instance variable calculated:
             fs: FluentState
                 the state represented as positive and negative fluent literal lists
+            index: PlanningGraphIndex
+                the actions of the problem and their static mutexes, shared by all the graphs of the problem
             all_actions: list of the PlanningProblem valid ground actions combined with calculated no-op actions
             s_levels: list of sets of PgNode_s, where each set in the list represents an S-level in the planning graph
             a_levels: list of sets of PgNode_a, where each set in the list represents an A-level in the planning graph
@@ -218,12 +224,14 @@ class PlanningGraph():
         self.problem = problem
         self.fs = decode_state(state, problem.state_map)
         self.serial = serial_planning
-        self.all_actions = self.problem.actions_list + self.noop_actions(self.problem.state_map)
+        self.index = planning_graph_index(problem)
+        self.all_actions = self.index.all_actions
         self.s_levels = []
         self.a_levels = []
         self.create_graph()
 
-    def noop_actions(self, literal_list):
+    @staticmethod
+    def noop_actions(literal_list):
         """create persistent action for each possible fluent
 
         "No-Op" actions are virtual actions (i.e., actions that only exist in
@@ -412,6 +420,9 @@ class PlanningGraph():
         :return: bool
         """
         # TODO test for Inconsistent Effects between nodes
+        ids = self.index.action_ids
+        if node_a1.action in ids and node_a2.action in ids:
+            return bool(self.index.inconsistent_effects[ids[node_a1.action], ids[node_a2.action]])
         if set(node_a1.action.effect_add) & set(node_a2.action.effect_rem):
             return True
         if set(node_a1.action.effect_rem) & set(node_a2.action.effect_add):
@@ -434,6 +445,9 @@ class PlanningGraph():
         :return: bool
         """
         # TODO test for Interference between nodes
+        ids = self.index.action_ids
+        if node_a1.action in ids and node_a2.action in ids:
+            return bool(self.index.interference[ids[node_a1.action], ids[node_a2.action]])
         # check effect node_a1 negates precond of node_a2
         if set(node_a1.action.effect_add) & set(node_a2.action.precond_neg):
             return True
@@ -545,3 +559,258 @@ class PlanningGraph():
                     break
 
         return level_sum
+
+
+def _bits(mask: int) -> list:
+    """indices of the set bits of mask, lowest first"""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+class PlanningGraphIndex():
+    """
+    The literals and actions of a planning problem as integer indices, shared
+    by every PlanningGraph and BitPlanningGraph of the problem.
+
+    Literal i < n is the fluent problem.state_map[i] and literal n + i is its
+    negation. Actions 0..m-1 are problem.actions_list and action m + x is the
+    no-op of literal x. Sets of literals and of actions are int bitmasks.
+    """
+
+    def __init__(self, problem: Problem):
+        """
+        :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
+        Instance variables calculated:
+            all_actions: list of Action, the actions of the problem followed by the no-ops
+            action_ids: dict, the index of every Action of all_actions
+            pre, eff: list of int, the precondition and effect literals of every action
+            producers, consumers: list of int, the actions with every literal as effect / precondition
+            inconsistent_effects, interference: numpy bool matrix, the static mutexes of every pair of actions
+            static_mutex: list of int, the actions mutex with every action whatever the level
+                (inconsistent effects or interference)
+            serial_mutex: list of int, the same plus the other non-persistent actions for serial planning
+        """
+        n = self.num_fluents = len(problem.state_map)
+        self.literal_index = {fluent: i for i, fluent in enumerate(problem.state_map)}
+        self.fluent_mask = (1 << n) - 1
+        self.actions = problem.actions_list
+        m = self.num_real = len(self.actions)
+        num_actions = m + 2 * n
+        noops = PlanningGraph.noop_actions(problem.state_map)
+        self.all_actions = self.actions + noops[0::2] + noops[1::2]
+        self.action_ids = {action: j for j, action in enumerate(self.all_actions)}
+
+        def literals(pos, neg):
+            mask = 0
+            for fluent in pos:
+                mask |= 1 << self.literal_index[fluent]
+            for fluent in neg:
+                mask |= 1 << (n + self.literal_index[fluent])
+            return mask
+
+        self.pre = [literals(a.precond_pos, a.precond_neg) for a in self.actions]
+        self.eff = [literals(a.effect_add, a.effect_rem) for a in self.actions]
+        self.pre += [1 << x for x in range(2 * n)]
+        self.eff += [1 << x for x in range(2 * n)]
+        self.pre_literals = [_bits(pre) for pre in self.pre]
+
+        self.producers = [0] * (2 * n)
+        self.consumers = [0] * (2 * n)
+        self.unconditioned = 0
+        for j in range(num_actions):
+            for x in _bits(self.eff[j]):
+                self.producers[x] |= 1 << j
+            for x in _bits(self.pre[j]):
+                self.consumers[x] |= 1 << j
+            if not self.pre[j]:
+                self.unconditioned |= 1 << j
+
+        pre = np.zeros((num_actions, 2 * n), dtype=np.float32)
+        eff = np.zeros((num_actions, 2 * n), dtype=np.float32)
+        for j in range(num_actions):
+            pre[j, self.pre_literals[j]] = 1
+            eff[j, _bits(self.eff[j])] = 1
+        negation = np.r_[n:2 * n, 0:n]
+        # an effect of one action negates an effect / a precondition of the other
+        self.inconsistent_effects = eff @ eff[:, negation].T > 0
+        self.interference = eff @ pre[:, negation].T > 0
+        self.interference |= self.interference.T
+        static = self.inconsistent_effects | self.interference
+        for matrix in (self.inconsistent_effects, self.interference, static):
+            np.fill_diagonal(matrix, False)
+
+        real_mask = (1 << m) - 1
+        self.static_mutex = _mask_rows(static)
+        self.serial_mutex = [row | real_mask & ~(1 << j) if j < m else row
+                             for j, row in enumerate(self.static_mutex)]
+
+    def negate(self, literals: int) -> int:
+        """the negations of a set of literals"""
+        n = self.num_fluents
+        return (literals >> n) | ((literals & self.fluent_mask) << n)
+
+    def state_literals(self, state) -> int:
+        """the literals of a state, as T/F string or integer bitmask"""
+        if isinstance(state, str):
+            state = sum(1 << i for i, char in enumerate(state) if char == 'T')
+        return state | ((~state & self.fluent_mask) << self.num_fluents)
+
+
+def _mask_rows(matrix: np.ndarray) -> list:
+    """the rows of a bool matrix as int bitmasks"""
+    packed = np.packbits(matrix, axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+_INDEXES = weakref.WeakKeyDictionary()
+
+
+def planning_graph_index(problem: Problem) -> PlanningGraphIndex:
+    """the PlanningGraphIndex of a problem, built on first use"""
+    index = _INDEXES.get(problem)
+    if index is None:
+        index = _INDEXES[problem] = PlanningGraphIndex(problem)
+    return index
+
+
+class BitPlanningGraph():
+    """
+    A planning graph with the same levels, mutexes and heuristic as
+    PlanningGraph, where the literals and actions are indices of the problem's
+    PlanningGraphIndex and every level and mutex set is an int bitmask.
+
+    The graph is built incrementally: since literals, actions and no-ops only
+    accumulate from level to level and mutexes only disappear, each A level
+    only tests the actions needing a literal added by the previous level, and
+    each S level only retests the literal pairs that were mutex before.
+    """
+
+    def __init__(self, problem: Problem, state, serial_planning=True):
+        """
+        :param problem: PlanningProblem (or subclass such as AirCargoProblem or HaveCakeProblem)
+        :param state: str or int (a TFTTFF... string or bitmask of fluent states)
+        :param serial_planning: bool (whether or not to assume that only one action can occur at a time)
+        Instance variable calculated:
+            s_levels: list of int, the literals of every S-level
+            a_levels: list of int, the actions of every A-level
+            s_mutex: list of dict, the literals mutex with every literal of every S-level
+            a_mutex: list of dict, the actions mutex with every action of every A-level
+            literal_levels: dict, the first S-level of every literal in the graph
+        """
+        self.problem = problem
+        self.index = planning_graph_index(problem)
+        self.static_mutex = self.index.serial_mutex if serial_planning else self.index.static_mutex
+        self.s_levels = []
+        self.a_levels = []
+        self.s_mutex = []
+        self.a_mutex = []
+        self.literal_levels = {}
+        self.create_graph(self.index.state_literals(state))
+
+    def create_graph(self, literals: int):
+        """ build the graph until the last two S levels contain the same literals
+
+        :param literals: int, the literals of S0
+        """
+        idx = self.index
+        level = 0
+        self.s_levels.append(literals)
+        self.s_mutex.append({})
+        for x in _bits(literals):
+            self.literal_levels[x] = 0
+        actions = 0
+        new_literals = literals
+        candidates = idx.unconditioned
+        while new_literals:
+            # only the actions needing a new literal may have become applicable
+            for x in _bits(new_literals):
+                candidates |= idx.consumers[x]
+            new_actions = 0
+            for j in _bits(candidates & ~actions):
+                if literals & idx.pre[j] == idx.pre[j]:
+                    new_actions |= 1 << j
+            candidates = 0
+            actions |= new_actions
+            self.a_levels.append(actions)
+            self.a_mutex.append(self.action_mutex(level, actions))
+
+            # the effects of the previous actions are already in the level
+            effects = literals
+            for j in _bits(new_actions):
+                effects |= idx.eff[j]
+            new_literals = effects & ~literals
+            literals = effects
+            level += 1
+            self.s_levels.append(literals)
+            for x in _bits(new_literals):
+                self.literal_levels[x] = level
+            self.s_mutex.append(self.literal_mutex(level, new_literals))
+
+    def action_mutex(self, level: int, actions: int) -> dict:
+        """ the mutexes of the A level: static mutexes from the index and
+        competing needs, i.e. mutex preconditions in the S level
+
+        :return: dict, the actions mutex with every action of the level
+        """
+        idx = self.index
+        consumers = idx.consumers
+        # the actions needing a literal mutex with each literal
+        competing = {}
+        for x, row in self.s_mutex[level].items():
+            needs = 0
+            for y in _bits(row):
+                needs |= consumers[y]
+            competing[x] = needs
+        mutex = {}
+        for j in _bits(actions):
+            row = self.static_mutex[j]
+            for x in idx.pre_literals[j]:
+                row |= competing.get(x, 0)
+            mutex[j] = row & actions & ~(1 << j)
+        return mutex
+
+    def literal_mutex(self, level: int, new_literals: int) -> dict:
+        """ the mutexes of the S level: negation and inconsistent support,
+        i.e. all the actions achieving one literal are mutex with all the
+        actions achieving the other
+
+        :return: dict, the literals mutex with every literal of the level
+        """
+        idx = self.index
+        literals = self.s_levels[level]
+        actions = self.a_levels[level - 1]
+        a_mutex = self.a_mutex[level - 1]
+        prev_mutex = self.s_mutex[level - 1]
+        achievers = {x: idx.producers[x] & actions for x in _bits(literals)}
+        mutex = {x: idx.negate(1 << x) & literals for x in achievers}
+        for x in _bits(literals):
+            # the actions mutex with every achiever of x
+            against = actions
+            for j in _bits(achievers[x]):
+                against &= a_mutex[j]
+            if new_literals >> x & 1:
+                candidates = literals
+            else:
+                candidates = prev_mutex.get(x, 0) | new_literals
+            # the relation is symmetric: test each pair once, from its lower literal
+            for y in _bits(candidates & ~((2 << x) - 1)):
+                if not achievers[y] & ~against:
+                    mutex[x] |= 1 << y
+                    mutex[y] |= 1 << x
+        return mutex
+
+    def h_levelsum(self) -> int:
+        """The sum of the level costs of the individual goals (admissible if goals independent)
+
+        :return: int
+        """
+        level_sum = 0
+        for goal in self.problem.goal:
+            x = self.index.literal_index.get(goal)
+            if x in self.literal_levels:
+                level_sum += self.literal_levels[x]
+        return level_sum
@@ -42,11 +42,35 @@ SEARCHES = [["breadth_first_search", breadth_first_search, ""],
 class PrintableProblem(InstrumentedProblem):
     """ InstrumentedProblem keeps track of stats during search, and this
     class modifies the print output of those statistics for air cargo
-    problems.
+    problems, adding the hit rate of the problem's heuristic cache during
+    the search when the heuristic uses it.
     """
 
+    def __init__(self, problem):
+        InstrumentedProblem.__init__(self, problem)
+        cache = getattr(problem, 'heuristic_cache', None)
+        self.cache_start = None if cache is None else (cache.hits, cache.misses)
+
+    def cache_stats(self):
+        """(hits, lookups) of the heuristic cache since the start of the search"""
+        if self.cache_start is None:
+            return 0, 0
+        cache = self.problem.heuristic_cache
+        hits = cache.hits - self.cache_start[0]
+        return hits, hits + cache.misses - self.cache_start[1]
+
+    def header(self):
+        header = "Expansions   Goal Tests   New Nodes"
+        if self.cache_stats()[1]:
+            header += "   Cache Hits"
+        return header
+
     def __repr__(self):
-        return '{:^10d}  {:^10d}  {:^10d}'.format(self.succs, self.goal_tests, self.states)
+        stats = '{:^10d}  {:^10d}  {:^10d}'.format(self.succs, self.goal_tests, self.states)
+        hits, lookups = self.cache_stats()
+        if lookups:
+            stats += '  {:^12}'.format('{:.1%}'.format(hits / lookups))
+        return stats
 
 
 def run_search(problem, search_function, parameter=None):
@@ -58,7 +82,7 @@ def run_search(problem, search_function, parameter=None):
     else:
         node = search_function(ip)
     end = timer()
-    print("\nExpansions   Goal Tests   New Nodes")
+    print("\n{}".format(ip.header()))
     print("{}\n".format(ip))
     show_solution(node, end - start)
     print()
@@ -85,7 +109,7 @@ def manual():
                                                " ".join(s_choices)))
 
 
-def main(p_choices, s_choices):
+def main(p_choices, s_choices, cache_size=8192):
 
     problems = [PROBLEMS[i-1] for i in map(int, p_choices)]
     searches = [SEARCHES[i-1] for i in map(int, s_choices)]
@@ -96,7 +120,7 @@ def main(p_choices, s_choices):
             hstring = h if not h else " with {}".format(h)
             print("\nSolving {} using {}{}...".format(pname, sname, hstring))
 
-            _p = p()
+            _p = p(cache_size)
             _h = None if not h else getattr(_p, h)
             run_search(_p, s, _h)
 
@@ -121,12 +145,17 @@ if __name__=="__main__":
                         help="Specify the indices of the problems to solve as a list of space separated values. Choose from: {!s}".format(list(range(1, len(PROBLEMS)+1))))
     parser.add_argument('-s', '--searches', nargs="+", choices=range(1, len(SEARCHES)+1), type=int, metavar='',
                         help="Specify the indices of the search algorithms to use as a list of space separated values. Choose from: {!s}".format(list(range(1, len(SEARCHES)+1))))
+    parser.add_argument('-c', '--cache-size', type=int, default=8192, metavar='',
+                        help="Number of heuristic values cached per problem (0 to disable, -1 for no limit).")
     args = parser.parse_args()
+    if args.cache_size < -1:
+        parser.error("--cache-size must be -1 (no limit), 0 (disabled) or positive")
+    cache_size = None if args.cache_size == -1 else args.cache_size
 
     if args.manual:
         manual()
     elif args.problems and args.searches:
-        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))))
+        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))), cache_size)
     else:
         print()
         parser.print_help()
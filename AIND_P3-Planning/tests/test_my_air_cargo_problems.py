@@ -6,7 +6,7 @@ from aimacode.planning import Action
 from aimacode.utils import expr
 from aimacode.search import Node
 import unittest
-from lp_utils import decode_state
+from lp_utils import decode_state, HeuristicCache
 from my_air_cargo_problems import (
     air_cargo_p1, air_cargo_p2, air_cargo_p3,
 )
@@ -17,7 +17,7 @@ class TestAirCargoProb1(unittest.TestCase):
         self.p1 = air_cargo_p1()
 
     def test_ACP1_num_fluents(self):
-        self.assertEqual(len(self.p1.initial), 12)
+        self.assertEqual(len(self.p1.state_map), 12)
 
     def test_ACP1_num_requirements(self):
         self.assertEqual(len(self.p1.goal),2)
@@ -29,7 +29,7 @@ class TestAirCargoProb2(unittest.TestCase):
         self.p2 = air_cargo_p2()
 
     def test_ACP2_num_fluents(self):
-        self.assertEqual(len(self.p2.initial), 27)
+        self.assertEqual(len(self.p2.state_map), 27)
 
     def test_ACP2_num_requirements(self):
         self.assertEqual(len(self.p2.goal),3)
@@ -41,7 +41,7 @@ class TestAirCargoProb3(unittest.TestCase):
         self.p3 = air_cargo_p3()
 
     def test_ACP3_num_fluents(self):
-        self.assertEqual(len(self.p3.initial), 32)
+        self.assertEqual(len(self.p3.state_map), 32)
 
     def test_ACP3_num_requirements(self):
         self.assertEqual(len(self.p3.goal),4)
@@ -76,9 +76,64 @@ class TestAirCargoMethods(unittest.TestCase):
         self.assertTrue(expr('In(C1, P1)') in fs.pos)
         self.assertTrue(expr('At(C1, SFO)') in fs.neg)
 
+    def test_AC_state_bits(self):
+        fs = decode_state(self.p1.initial, self.p1.state_map)
+        self.assertEqual(fs.pos, self.p1.state_map[:4])
+        self.assertEqual(self.p1.result(self.p1.initial, self.act1) & ~self.p1.initial,
+                         1 << self.p1.state_map.index(expr('In(C1, P1)')))
+        self.assertFalse(self.p1.goal_test(self.p1.initial))
+
+    def test_AC_actions_index(self):
+        p2 = air_cargo_p2()
+        states = [p2.initial]
+        seen = {p2.initial}
+        i = 0
+        while i < min(len(states), 200):
+            state = states[i]
+            i += 1
+            fs = decode_state(state, p2.state_map)
+            expected = [action for action in p2.actions_list
+                        if all(f in fs.pos for f in action.precond_pos) and
+                        not any(f in fs.pos for f in action.precond_neg)]
+            self.assertEqual(p2.actions(state), expected)
+            for action in expected:
+                child = p2.result(state, action)
+                if child not in seen:
+                    seen.add(child)
+                    states.append(child)
+        self.assertEqual(i, 200)
+
     def test_h_ignore_preconditions(self):
         n = Node(self.p1.initial)
         self.assertEqual(self.p1.h_ignore_preconditions(n),2)
 
+class TestHeuristicCache(unittest.TestCase):
+
+    def test_state_keyed(self):
+        p1 = air_cargo_p1()
+        # two nodes reaching the same state share the cached value
+        self.assertEqual(p1.h_ignore_preconditions(Node(p1.initial)), 2)
+        self.assertEqual(p1.h_ignore_preconditions(Node(p1.initial, Node(p1.initial))), 2)
+        self.assertEqual((p1.heuristic_cache.hits, p1.heuristic_cache.misses), (1, 1))
+        self.assertEqual(air_cargo_p1().heuristic_cache.hits, 0)
+
+    def test_eviction(self):
+        cache = HeuristicCache(maxsize=2)
+        for state in [1, 2, 1, 3, 2]:
+            cache.lookup('h', state, lambda s: -s)
+        # 2 was the least recently used value when 3 was added
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 4, 2))
+        self.assertEqual(len(cache), 2)
+        self.assertAlmostEqual(cache.hit_rate(), 0.2)
+
+    def test_maxsize(self):
+        self.assertRaises(ValueError, HeuristicCache, -1)
+        self.assertRaises(ValueError, HeuristicCache, 1.5)
+        cache = HeuristicCache(maxsize=None)
+        for state in range(100):
+            cache.lookup('h', state, lambda s: s)
+        self.assertEqual((len(cache), cache.evictions), (100, 0))
+
+
 if __name__ == '__main__':
     unittest.main()
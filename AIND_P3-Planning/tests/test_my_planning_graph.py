@@ -3,12 +3,14 @@ import sys
 
 parent = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.dirname(parent))
+import copy
 import unittest
 from aimacode.utils import expr
 from aimacode.planning import Action
 from example_have_cake import have_cake
+from my_air_cargo_problems import air_cargo_p1, air_cargo_p2
 from my_planning_graph import (
-    PlanningGraph, PgNode_a, PgNode_s, mutexify
+    PlanningGraph, PgNode_a, PgNode_s, mutexify, BitPlanningGraph
 )
 
 
@@ -115,6 +117,19 @@ class TestPlanningGraphMutex(unittest.TestCase):
             "If one parent action can achieve both states, should NOT be inconsistent-support mutex, even if parent actions are themselves mutex")
 
 
+    def test_static_mutex_matrix(self):
+        index = self.pg.index
+        # copies of the actions are not in the index, so are compared with sets
+        nodes = [PgNode_a(copy.copy(action)) for action in index.all_actions]
+        for i, n1 in enumerate(nodes):
+            for j, n2 in enumerate(nodes):
+                if i != j:
+                    self.assertEqual(index.inconsistent_effects[i, j],
+                                     PlanningGraph.inconsistent_effects_mutex(self.pg, n1, n2))
+                    self.assertEqual(index.interference[i, j],
+                                     PlanningGraph.interference_mutex(self.pg, n1, n2))
+
+
 class TestPlanningGraphHeuristics(unittest.TestCase):
     def setUp(self):
         self.p = have_cake()
@@ -124,5 +139,56 @@ class TestPlanningGraphHeuristics(unittest.TestCase):
         self.assertEqual(self.pg.h_levelsum(), 1)
 
 
+class TestBitPlanningGraph(unittest.TestCase):
+    def setUp(self):
+        self.p = have_cake()
+        self.bpg = BitPlanningGraph(self.p, self.p.initial)
+
+    def assertSameGraph(self, problem, state, serial_planning):
+        """compare every level and mutex set of both graphs, mapping the
+        nodes of PlanningGraph to their PlanningGraphIndex ids"""
+        pg = PlanningGraph(problem, state, serial_planning)
+        bpg = BitPlanningGraph(problem, state, serial_planning)
+        index = bpg.index
+
+        def literal(node):
+            return index.literal_index[node.symbol] + (0 if node.is_pos else index.num_fluents)
+
+        def action(node):
+            return index.action_ids[node.action]
+
+        def mask(ids):
+            return sum(1 << i for i in ids)
+
+        self.assertEqual(len(pg.s_levels), len(bpg.s_levels))
+        self.assertEqual(len(pg.a_levels), len(bpg.a_levels))
+        for level, nodes in enumerate(pg.s_levels):
+            self.assertEqual(mask(map(literal, nodes)), bpg.s_levels[level])
+            self.assertEqual({literal(node): mask(map(literal, node.mutex)) for node in nodes},
+                             {x: bpg.s_mutex[level].get(x, 0) for x in map(literal, nodes)})
+        for level, nodes in enumerate(pg.a_levels):
+            self.assertEqual(mask(map(action, nodes)), bpg.a_levels[level])
+            self.assertEqual({action(node): mask(map(action, node.mutex)) for node in nodes},
+                             bpg.a_mutex[level])
+        self.assertEqual(pg.h_levelsum(), bpg.h_levelsum())
+
+    def test_have_cake(self):
+        for serial_planning in (True, False):
+            self.assertSameGraph(self.p, self.p.initial, serial_planning)
+
+    def test_air_cargo(self):
+        p1 = air_cargo_p1()
+        state = p1.initial
+        for _ in range(3):
+            for serial_planning in (True, False):
+                self.assertSameGraph(p1, state, serial_planning)
+            state = p1.result(state, p1.actions(state)[-1])
+        p2 = air_cargo_p2()
+        self.assertSameGraph(p2, p2.initial, True)
+
+    def test_levelsum(self):
+        self.assertEqual(self.bpg.h_levelsum(), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,3 @@
-import copy
-
 xlim = 3
 ylim = 2
 
@@ -28,7 +26,12 @@ class GameState:
         if move not in self.get_legal_moves():
             raise RuntimeError("Attempted forecast of illegal move")
 
-        newBoard = copy.deepcopy(self)
+        # the state only holds lists of ints, so copying the lists is enough
+        # and much cheaper than copy.deepcopy
+        newBoard = GameState.__new__(GameState)
+        newBoard._player = self._player
+        newBoard._location = list(self._location)
+        newBoard._board = [list(column) for column in self._board]
         newBoard._location[newBoard._player] = move
         newBoard._board[move[0]][move[1]] = 0
         newBoard._player ^= 1
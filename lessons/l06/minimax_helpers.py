@@ -11,11 +11,14 @@ def min_value(gameState):
     otherwise return the minimum value over all legal child
     nodes.
     """
-    if terminal_test(gameState):
+    # the legal moves are computed once per node: an empty list is the
+    # terminal test
+    moves = gameState.get_legal_moves()
+    if not moves:
         return 1
 
     min_val = float("inf")
-    for m in gameState.get_legal_moves():
+    for m in moves:
         g = gameState.forecast_move(m)
         min_val = min(min_val, max_value(g))
     return min_val
@@ -25,15 +28,16 @@ def max_value(gameState):
     otherwise return the maximum value over all legal child
     nodes.
     """
-    if terminal_test(gameState):
+    moves = gameState.get_legal_moves()
+    if not moves:
         return -1
 
     max_val = float("-inf")
 
-    for m in gameState.get_legal_moves():
+    for m in moves:
         g = gameState.forecast_move(m)
-        min_val = max(max_val, min_value(g))
-    return min_val
+        max_val = max(max_val, min_value(g))
+    return max_val
 
 
 # This solution does the same thing using the built-in `max` function
@@ -0,0 +1,30 @@
+
+import gamestate
+import minimax_helpers
+from compact import CompactGame, minimax_decision
+
+print("Solving the {}x{} game...".format(gamestate.xlim, gamestate.ylim))
+game = CompactGame()
+print("The first player {}.".format("wins" if game.solve(game.initial) > 0 else "loses"))
+
+print("Comparing with minimax_helpers on every state of the first two plies...")
+failures = 0
+g = gamestate.GameState()
+for m1 in g.get_legal_moves():
+    g1 = g.forecast_move(m1)
+    for state in [g1] + [g1.forecast_move(m2) for m2 in g1.get_legal_moves()]:
+        if not state.get_legal_moves():
+            continue
+        if game.solve(game.from_gamestate(state)) != minimax_helpers.max_value(state):
+            failures += 1
+        if minimax_decision(state) != minimax_helpers.minimax_decision(state):
+            failures += 1
+if failures:
+    print("Failed\n  {} states disagree with minimax_helpers.".format(failures))
+else:
+    print("Everything looks good!")
+
+print("Solving the 4x4 game...")
+game = CompactGame(4, 4)
+print("The first player {} ({} states).".format(
+    "wins" if game.solve(game.initial) > 0 else "loses", len(game.values)))